@@ -0,0 +1,298 @@
+"""
+Hardware-aware tuning of batch size and thread counts
+
+Probes the CPU, then runs short timed inference and training trials over
+batch sizes, image sizes and torch intra-/inter-op thread counts. The
+fastest settings are written to a profile that detect.py, batch_process
+and train.py pick up automatically when the matching options are not
+given on the command line.
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import time
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+PROFILE_PATH = Path(os.environ.get('AUTOTUNE_PROFILE', 'autotune.json'))
+
+_SIMD_FLAGS = ('sse4_2', 'avx', 'avx2', 'fma', 'avx_vnni', 'avx512f', 'avx512_bf16',
+               'avx512_vnni', 'amx_tile', 'neon', 'asimd')
+
+
+def _cpu_info():
+    """CPU model name and feature flags, without importing torch"""
+    cpu_model = platform.processor()
+    flags = set()
+    try:
+        with open('/proc/cpuinfo') as f:
+            for line in f:
+                key, _, value = line.partition(':')
+                key = key.strip()
+                if key == 'model name':
+                    cpu_model = value.strip()
+                elif key in ('flags', 'Features'):
+                    flags.update(value.split())
+    except OSError:
+        pass
+    return cpu_model, flags
+
+
+def _core_counts():
+    """(logical, physical) core counts"""
+    import psutil
+    return (psutil.cpu_count(logical=True) or os.cpu_count() or 1,
+            psutil.cpu_count(logical=False) or os.cpu_count() or 1)
+
+
+def probe_hardware() -> Dict:
+    """CPU model, core counts, memory and SIMD extensions of this machine"""
+    import psutil
+    import torch
+
+    cpu_model, flags = _cpu_info()
+    logical, physical = _core_counts()
+    return {
+        'cpu_model': cpu_model,
+        'machine': platform.machine(),
+        'logical_cores': logical,
+        'physical_cores': physical,
+        'memory_gb': round(psutil.virtual_memory().total / 1e9, 1),
+        'simd': [flag for flag in _SIMD_FLAGS if flag in flags],
+        'torch_cpu_capability': torch.backends.cpu.get_cpu_capability(),
+    }
+
+
+def hardware_signature(hardware: Dict) -> str:
+    """Identifies machines a profile is valid for"""
+    return f"{hardware['cpu_model']}|{hardware['logical_cores']}|{hardware['physical_cores']}"
+
+
+@lru_cache(maxsize=1)
+def current_signature() -> str:
+    """hardware_signature of this machine, computed cheaply and only once"""
+    cpu_model, _ = _cpu_info()
+    logical, physical = _core_counts()
+    return hardware_signature({'cpu_model': cpu_model, 'logical_cores': logical,
+                               'physical_cores': physical})
+
+
+def thread_candidates(hardware: Dict) -> List[int]:
+    physical, logical = hardware['physical_cores'], hardware['logical_cores']
+    return sorted({max(1, physical // 2), physical, logical})
+
+
+def _peak_rss_mb() -> float:
+    try:
+        import resource
+    except ImportError:
+        # Windows has no resource module; psutil reports the peak working set
+        import psutil
+        memory = psutil.Process().memory_info()
+        return getattr(memory, 'peak_wset', memory.rss) / (1024 * 1024)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is bytes on macOS, kilobytes elsewhere
+    return peak / (1024 * 1024) if platform.system() == 'Darwin' else peak / 1024
+
+
+def _time_calls(func, duration: float, min_calls: int = 3) -> float:
+    """Seconds per call of func, after one warm-up call"""
+    func()
+    calls = 0
+    start = time.perf_counter()
+    while calls < min_calls or time.perf_counter() - start < duration:
+        func()
+        calls += 1
+    return (time.perf_counter() - start) / calls
+
+
+def _run_trials(model_path: str, threads: int, interop_threads: int, imgsz_list: List[int],
+                batches: List[int], train_batches: List[int], duration: float,
+                memory_budget_mb: float) -> List[Dict]:
+    """
+    Time every batch/imgsz combination for one thread configuration
+
+    Runs in a fresh process: torch only accepts the inter-op thread count
+    before its first parallel operation.
+    """
+    import torch
+    from ultralytics import YOLO
+
+    torch.set_num_threads(threads)
+    torch.set_num_interop_threads(interop_threads)
+    model = YOLO(model_path)
+    trials = []
+
+    for imgsz in imgsz_list:
+        frames = [np.random.randint(0, 255, (720, 1280, 3), dtype=np.uint8)
+                  for _ in range(max(batches))]
+        for batch in batches:
+            seconds = _time_calls(lambda: model(frames[:batch], imgsz=imgsz, verbose=False),
+                                  duration)
+            trials.append({'kind': 'inference', 'imgsz': imgsz, 'batch': batch,
+                           'threads': threads, 'interop_threads': interop_threads,
+                           'images_per_s': batch / seconds})
+
+    if not train_batches:
+        return trials
+
+    # Training steps on random tensors: forward, backward and an optimizer step
+    net = YOLO(model_path).model.float().train()
+    for parameter in net.parameters():
+        parameter.requires_grad_(True)
+    optimizer = torch.optim.SGD(net.parameters(), lr=1e-4)
+
+    def step(images):
+        optimizer.zero_grad()
+        outputs = net(images)
+        tensors = outputs.values() if isinstance(outputs, dict) else outputs
+        loss = sum(t.float().mean() for t in tensors if isinstance(t, torch.Tensor))
+        loss.backward()
+        optimizer.step()
+
+    for imgsz in imgsz_list:
+        for batch in train_batches:
+            images = torch.rand(batch, 3, imgsz, imgsz)
+            seconds = _time_calls(lambda: step(images), duration, min_calls=2)
+            rss = _peak_rss_mb()
+            trials.append({'kind': 'training', 'imgsz': imgsz, 'batch': batch,
+                           'threads': threads, 'interop_threads': interop_threads,
+                           'images_per_s': batch / seconds, 'peak_rss_mb': rss})
+            # Larger batches would only use more memory
+            if rss > memory_budget_mb:
+                break
+    return trials
+
+
+def best_settings(trials: List[Dict], kind: str) -> Dict[str, Dict]:
+    """Fastest trial of a kind for each imgsz"""
+    best = {}
+    for trial in trials:
+        if trial['kind'] != kind:
+            continue
+        key = str(trial['imgsz'])
+        if key not in best or trial['images_per_s'] > best[key]['images_per_s']:
+            best[key] = {k: trial[k] for k in ('batch', 'threads', 'interop_threads', 'images_per_s')}
+    return best
+
+
+def autotune(model_path: str, imgsz_list: List[int], batches: List[int],
+             train_batches: List[int], duration: float = 2.0,
+             output: Path = PROFILE_PATH) -> Dict:
+    """
+    Run all trials and write the profile
+
+    Returns:
+        The profile dictionary
+    """
+    hardware = probe_hardware()
+    print(f"CPU: {hardware['cpu_model']} ({hardware['physical_cores']} cores, "
+          f"{hardware['logical_cores']} threads, {hardware['memory_gb']} GB)")
+    print(f"SIMD: {', '.join(hardware['simd']) or 'none detected'} "
+          f"(torch kernels: {hardware['torch_cpu_capability']})")
+
+    memory_budget_mb = hardware['memory_gb'] * 1000 * 0.6
+    context = multiprocessing.get_context('spawn')
+    trials = []
+    for threads in thread_candidates(hardware):
+        for interop_threads in sorted({1, min(2, threads)}):
+            print(f"Trials with {threads} intra-op / {interop_threads} inter-op threads...")
+            with context.Pool(1, maxtasksperchild=1) as pool:
+                results = pool.apply(_run_trials, (model_path, threads, interop_threads,
+                                                   imgsz_list, batches, train_batches,
+                                                   duration, memory_budget_mb))
+            for trial in results:
+                print(f"  {trial['kind']:>9} imgsz {trial['imgsz']} batch {trial['batch']:>3}: "
+                      f"{trial['images_per_s']:.1f} images/s")
+            trials.extend(results)
+
+    profile = {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'model': str(model_path),
+        'hardware': hardware,
+        'signature': hardware_signature(hardware),
+        'inference': best_settings(trials, 'inference'),
+        'training': best_settings(trials, 'training'),
+        'trials': trials,
+    }
+    output = Path(output)
+    output.write_text(json.dumps(profile, indent=2))
+
+    for kind in ('inference', 'training'):
+        for imgsz, settings in profile[kind].items():
+            print(f"Best {kind} at imgsz {imgsz}: batch {settings['batch']}, "
+                  f"{settings['threads']}/{settings['interop_threads']} threads "
+                  f"({settings['images_per_s']:.1f} images/s)")
+    print(f"Profile saved to: {output}")
+    return profile
+
+
+def load_profile(path: Path = PROFILE_PATH) -> Optional[Dict]:
+    """Load the profile if it exists and was tuned on this kind of machine"""
+    path = Path(path)
+    if not path.exists():
+        return None
+    profile = json.loads(path.read_text())
+    if profile.get('signature') != current_signature():
+        print(f"Ignoring autotune profile {path}: it was tuned on different hardware")
+        return None
+    return profile
+
+
+def tuned_settings(kind: str, imgsz: int, path: Path = PROFILE_PATH) -> Optional[Dict]:
+    """
+    Tuned batch size and thread counts for 'inference' or 'training'
+
+    Uses the entry for the nearest tuned imgsz. Returns None without a
+    usable profile.
+    """
+    profile = load_profile(path)
+    if not profile or not profile.get(kind):
+        return None
+    entries = profile[kind]
+    nearest = min(entries, key=lambda size: abs(int(size) - imgsz))
+    return entries[nearest]
+
+
+def apply_threads(settings: Dict):
+    """Set torch's intra- and inter-op thread counts from tuned settings"""
+    import torch
+
+    torch.set_num_threads(settings['threads'])
+    try:
+        torch.set_num_interop_threads(settings['interop_threads'])
+    except RuntimeError:
+        # Only possible before torch's first parallel operation
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Tune batch size and thread counts for this machine')
+    parser.add_argument('--model', type=str, default='yolov8n.pt',
+                        help='Model used for the trials (default: yolov8n.pt)')
+    parser.add_argument('--imgsz', type=int, nargs='+', default=[640],
+                        help='Image sizes to tune for (default: 640)')
+    parser.add_argument('--batch', type=int, nargs='+', default=[1, 2, 4, 8, 16],
+                        help='Inference batch sizes to try')
+    parser.add_argument('--train-batch', type=int, nargs='+', default=[4, 8, 16, 32],
+                        help='Training batch sizes to try')
+    parser.add_argument('--no-train', action='store_true',
+                        help='Only tune inference')
+    parser.add_argument('--duration', type=float, default=2.0,
+                        help='Seconds timed per trial (default: 2)')
+    parser.add_argument('--output', type=str, default=str(PROFILE_PATH),
+                        help=f'Profile file (default: {PROFILE_PATH}, or $AUTOTUNE_PROFILE)')
+    args = parser.parse_args()
+
+    autotune(args.model, args.imgsz, args.batch, [] if args.no_train else args.train_batch,
+             args.duration, Path(args.output))
+
+
+if __name__ == '__main__':
+    main()
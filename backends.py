@@ -0,0 +1,166 @@
+"""
+Inference backends: PyTorch weights or exported ONNX Runtime / OpenVINO models
+
+Exported models are loaded through ultralytics, so they return the same
+Results objects as the PyTorch model and work unchanged with
+count_objects, save_detection_summary and the rest of utils.
+"""
+
+import os
+from pathlib import Path
+
+import numpy as np
+
+from utils import box_iou, extract_detections
+
+BACKENDS = ('torch', 'onnx', 'openvino')
+
+
+def backend_for_path(model_path: str) -> str:
+    """Guess the backend of a model file from its name"""
+    path = str(model_path).rstrip('/\\')
+    if path.endswith('.onnx'):
+        return 'onnx'
+    if path.endswith('_openvino_model'):
+        return 'openvino'
+    return 'torch'
+
+
+def exported_path(model_path: str, backend: str) -> Path:
+    """Location ultralytics exports a backend's model to, next to the weights"""
+    weights = Path(model_path)
+    if backend == 'onnx':
+        return weights.with_suffix('.onnx')
+    if backend == 'openvino':
+        return weights.parent / f"{weights.stem}_openvino_model"
+    return weights
+
+
+def export_model(model_path: str, backend: str, imgsz: int = 640) -> Path:
+    """
+    Export PyTorch weights for a backend, reusing a previous export
+
+    The export is cached next to the weights and redone only when the
+    weights are newer than it. Batch and image size are left dynamic so
+    the exported model serves batched and arbitrary-size inference.
+
+    Args:
+        model_path: Path to the .pt weights
+        backend: 'onnx' or 'openvino'
+        imgsz: Image size used to trace the model
+
+    Returns:
+        Path of the exported model
+    """
+    target = exported_path(model_path, backend)
+    weights = Path(model_path)
+    if target.exists() and weights.exists() and \
+            target.stat().st_mtime >= weights.stat().st_mtime:
+        return target
+
+    print(f"Exporting {model_path} to {backend} (one-time)...")
+    from ultralytics import YOLO
+
+    exported = YOLO(model_path).export(format=backend, imgsz=imgsz, dynamic=True)
+    return Path(exported)
+
+
+def _tune_onnx_session(model, onnx_path: Path, threads: int):
+    """Recreate the ONNX Runtime session with CPU thread settings"""
+    import onnxruntime
+
+    # The predictor (and its runtime backend) is created lazily on first use;
+    # ultralytics >= 8.4 wraps the runtime in an extra backend object
+    backend = model.predictor.model
+    backend = getattr(backend, 'backend', backend)
+    if not hasattr(backend, 'session'):
+        return
+
+    options = onnxruntime.SessionOptions()
+    options.intra_op_num_threads = threads
+    options.inter_op_num_threads = 1
+    options.execution_mode = onnxruntime.ExecutionMode.ORT_SEQUENTIAL
+    options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+    backend.session = onnxruntime.InferenceSession(str(onnx_path), options,
+                                                   providers=['CPUExecutionProvider'])
+
+
+def load_model(model_path: str, backend: str = None, imgsz: int = 640, threads: int = None):
+    """
+    Load a YOLO model for the requested backend
+
+    Args:
+        model_path: Path to .pt weights (or an already exported model)
+        backend: 'torch', 'onnx' or 'openvino' (None = infer from model_path)
+        imgsz: Image size used for export and warm-up
+        threads: CPU threads for ONNX Runtime (None = all cores)
+
+    Returns:
+        YOLO model instance
+    """
+    if backend is None:
+        backend = backend_for_path(model_path)
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend '{backend}', expected one of {BACKENDS}")
+
+    # Importing ultralytics pulls in torch, so it waits until a model is needed
+    from ultralytics import YOLO
+
+    if backend == 'torch' or backend_for_path(model_path) == backend:
+        path = Path(model_path)
+    else:
+        path = export_model(model_path, backend, imgsz)
+
+    if backend == 'torch':
+        return YOLO(str(path))
+
+    model = YOLO(str(path), task='detect')
+    # Warm up once so the predictor and runtime session exist
+    model(np.zeros((imgsz, imgsz, 3), dtype=np.uint8), imgsz=imgsz, verbose=False)
+    if backend == 'onnx':
+        _tune_onnx_session(model, path, threads or os.cpu_count() or 1)
+    return model
+
+
+def check_parity(reference_model, model, images, conf_threshold: float = 0.25,
+                 imgsz: int = 640, iou_threshold: float = 0.9) -> bool:
+    """
+    Compare an exported model's detections with the PyTorch model's
+
+    Args:
+        reference_model: PyTorch YOLO model
+        model: Model to check (e.g. ONNX Runtime backend)
+        images: List of images (paths or numpy arrays)
+        conf_threshold: Confidence threshold
+        imgsz: Inference image size
+        iou_threshold: Minimum IoU for a box to count as matching
+
+    Returns:
+        True if every reference box has a same-class match in the other model
+    """
+    print(f"Checking backend parity on {len(images)} images...")
+    all_match = True
+    for i, image in enumerate(images):
+        expected = extract_detections(
+            reference_model(image, conf=conf_threshold, imgsz=imgsz, verbose=False)[0])
+        actual = extract_detections(model(image, conf=conf_threshold, imgsz=imgsz, verbose=False)[0])
+
+        matched = 0
+        max_conf_diff = 0.0
+        if len(expected['cls']) and len(actual['cls']):
+            iou = box_iou(expected['xyxy'], actual['xyxy'])
+            iou[expected['cls'][:, None] != actual['cls'][None, :]] = 0.0
+            best = iou.argmax(axis=1)
+            found = iou[np.arange(len(best)), best] >= iou_threshold
+            matched = int(found.sum())
+            if matched:
+                max_conf_diff = float(np.abs(expected['conf'][found] -
+                                             actual['conf'][best[found]]).max())
+
+        ok = matched == len(expected['cls']) and len(actual['cls']) == len(expected['cls'])
+        all_match &= ok
+        print(f"  image {i + 1}: {'✓' if ok else '✗'} {matched}/{len(expected['cls'])} boxes matched "
+              f"({len(actual['cls'])} detected), max conf diff {max_conf_diff:.4f}")
+
+    print("✓ Backend output matches PyTorch" if all_match else "✗ Backend output differs from PyTorch")
+    return all_match
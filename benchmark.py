@@ -0,0 +1,288 @@
+"""
+Benchmark suite for the detection entry points
+Uses locally generated synthetic images and videos; results are written as JSON
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import platform
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+STAGES = ('decode', 'preprocess', 'inference', 'postprocess', 'annotate', 'encode')
+
+
+def make_synthetic_images(directory, count=32, width=1280, height=720, seed=0):
+    """Create JPEG test images with a few solid shapes (see create_test_image)"""
+    rng = np.random.default_rng(seed)
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    paths = []
+    for i in range(count):
+        image = np.empty((height, width, 3), dtype=np.uint8)
+        image[:] = rng.integers(120, 255, 3)
+        for _ in range(3):
+            x, y = rng.integers(0, width - 200), rng.integers(0, height - 200)
+            color = tuple(int(c) for c in rng.integers(0, 255, 3))
+            cv2.rectangle(image, (int(x), int(y)), (int(x) + 180, int(y) + 180), color, -1)
+        cv2.ellipse(image, (width // 2, height // 2), (width // 8, height // 6), 0, 0, 360,
+                    (0, 128, 0), -1)
+        path = directory / f"bench_{i:04d}.jpg"
+        cv2.imwrite(str(path), image)
+        paths.append(path)
+    return paths
+
+
+def make_synthetic_video(path, frames=120, width=1280, height=720, fps=30):
+    """Create an MP4 with a moving rectangle and ellipse"""
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*'mp4v'), fps, (width, height))
+    for i in range(frames):
+        frame = np.full((height, width, 3), (230, 216, 173), dtype=np.uint8)
+        x = int((width - 200) * i / max(frames - 1, 1))
+        cv2.rectangle(frame, (x, 100), (x + 200, 300), (0, 0, 255), -1)
+        cv2.ellipse(frame, (width - x - 100, height - 200), (100, 80), 0, 0, 360, (0, 128, 0), -1)
+        writer.write(frame)
+    writer.release()
+    return Path(path)
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB"""
+    try:
+        import resource
+    except ImportError:
+        # Windows has no resource module; psutil reports the peak working set
+        import psutil
+        memory = psutil.Process().memory_info()
+        return getattr(memory, 'peak_wset', memory.rss) / (1024 * 1024)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is bytes on macOS, kilobytes elsewhere
+    return peak / (1024 * 1024) if platform.system() == 'Darwin' else peak / 1024
+
+
+def bench_stages(model, image_paths, imgsz, conf_threshold):
+    """Mean per-image latency (ms) of each stage of single-image detection"""
+    from utils import plot_result
+
+    totals = dict.fromkeys(STAGES, 0.0)
+    for path in image_paths:
+        start = time.perf_counter()
+        image = cv2.imread(str(path))
+        totals['decode'] += time.perf_counter() - start
+
+        result = model(image, conf=conf_threshold, imgsz=imgsz, verbose=False)[0]
+        totals['preprocess'] += result.speed['preprocess'] / 1000
+        totals['inference'] += result.speed['inference'] / 1000
+        totals['postprocess'] += result.speed['postprocess'] / 1000
+
+        start = time.perf_counter()
+        annotated = plot_result(result, image)
+        totals['annotate'] += time.perf_counter() - start
+
+        start = time.perf_counter()
+        cv2.imencode('.jpg', annotated)
+        totals['encode'] += time.perf_counter() - start
+
+    return {stage: 1000 * total / len(image_paths) for stage, total in totals.items()}
+
+
+def bench_config(model_path, imgsz, image_paths, video_path, conf_threshold=0.25,
+                 batch_size=8, workers=0, repeats=1):
+    """
+    Benchmark one model/imgsz combination
+
+    Meant to run in a fresh process so model load time and peak RSS are
+    not affected by earlier configurations.
+    """
+    import detect
+    from registry import get_model
+    from utils import batch_process
+
+    start = time.perf_counter()
+    model = get_model(model_path, imgsz=imgsz)
+    load_s = time.perf_counter() - start
+
+    record = {
+        'model': str(model_path),
+        'imgsz': imgsz,
+        'model_load_s': load_s,
+        'stages_ms': bench_stages(model, image_paths, imgsz, conf_threshold),
+    }
+
+    with tempfile.TemporaryDirectory() as output_dir, \
+            contextlib.redirect_stdout(io.StringIO()):
+        image_dir = str(Path(image_paths[0]).parent)
+
+        start = time.perf_counter()
+        for _ in range(repeats):
+            for path in image_paths:
+                with contextlib.redirect_stderr(io.StringIO()):
+                    detect.detect_image(model, str(path), output_dir, conf_threshold, imgsz=imgsz)
+        elapsed = time.perf_counter() - start
+        record['detect_image_ips'] = repeats * len(image_paths) / elapsed
+
+        start = time.perf_counter()
+        for _ in range(repeats):
+            batch_process(model, image_dir, output_dir, conf_threshold,
+                          batch_size=batch_size, imgsz=imgsz, workers=workers)
+        elapsed = time.perf_counter() - start
+        record['batch_process_ips'] = repeats * len(image_paths) / elapsed
+
+        frames = int(cv2.VideoCapture(str(video_path)).get(cv2.CAP_PROP_FRAME_COUNT))
+        start = time.perf_counter()
+        for _ in range(repeats):
+            detect.detect_video(model, str(video_path), output_dir, conf_threshold, imgsz=imgsz)
+        elapsed = time.perf_counter() - start
+        record['detect_video_fps'] = repeats * frames / elapsed
+
+    record['peak_rss_mb'] = peak_rss_mb()
+    return record
+
+
+def _run_isolated(func, *args):
+    """Run func(*args) in a fresh spawned process and return its result"""
+    context = multiprocessing.get_context('spawn')
+    with context.Pool(1, maxtasksperchild=1) as pool:
+        return pool.apply(func, args)
+
+
+def environment_info():
+    """Versions and hardware the benchmark ran on"""
+    import torch
+    import ultralytics
+
+    return {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'platform': platform.platform(),
+        'python': platform.python_version(),
+        'cpu_count': os.cpu_count(),
+        'torch': torch.__version__,
+        'torch_threads': torch.get_num_threads(),
+        'ultralytics': ultralytics.__version__,
+        'opencv': cv2.__version__,
+    }
+
+
+# Metrics compared between runs and whether higher values are better
+_METRICS = {
+    'model_load_s': False,
+    'detect_image_ips': True,
+    'batch_process_ips': True,
+    'detect_video_fps': True,
+    'peak_rss_mb': False,
+}
+
+
+def compare_runs(current, baseline, tolerance=0.1):
+    """
+    Print metric changes versus a baseline run and flag regressions
+
+    Args:
+        current: Benchmark report of this run
+        baseline: Benchmark report to compare against
+        tolerance: Relative change that counts as a regression
+
+    Returns:
+        Number of regressions found
+    """
+    previous = {(r['model'], r['imgsz']): r for r in baseline['results']}
+    regressions = 0
+    print("\nComparison with baseline:")
+    for record in current['results']:
+        key = (record['model'], record['imgsz'])
+        if key not in previous:
+            print(f"  {key[0]} @ {key[1]}: no baseline")
+            continue
+        for metric, higher_is_better in _METRICS.items():
+            old, new = previous[key].get(metric), record.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            worse = -change if higher_is_better else change
+            flag = ''
+            if worse > tolerance:
+                flag = '  <-- REGRESSION'
+                regressions += 1
+            print(f"  {key[0]} @ {key[1]} {metric}: {old:.2f} -> {new:.2f} ({change:+.1%}){flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark detection entry points')
+    parser.add_argument('--models', type=str, nargs='+', default=['yolov8n.pt'],
+                        help='Model files to benchmark (default: yolov8n.pt)')
+    parser.add_argument('--imgsz', type=int, nargs='+', default=[640],
+                        help='Inference image sizes to benchmark (default: 640)')
+    parser.add_argument('--images', type=int, default=32,
+                        help='Number of synthetic images (default: 32)')
+    parser.add_argument('--video-frames', type=int, default=120,
+                        help='Frames in the synthetic video (default: 120)')
+    parser.add_argument('--width', type=int, default=1280,
+                        help='Synthetic image/video width (default: 1280)')
+    parser.add_argument('--height', type=int, default=720,
+                        help='Synthetic image/video height (default: 720)')
+    parser.add_argument('--conf', type=float, default=0.25,
+                        help='Confidence threshold (default: 0.25)')
+    parser.add_argument('--batch', type=int, default=8,
+                        help='batch_process batch size (default: 8)')
+    parser.add_argument('--workers', type=int, default=0,
+                        help='batch_process decode/write threads (default: 0)')
+    parser.add_argument('--repeats', type=int, default=1,
+                        help='Timed repetitions per entry point (default: 1)')
+    parser.add_argument('--output', type=str, default='benchmark.json',
+                        help='JSON report path (default: benchmark.json)')
+    parser.add_argument('--compare', type=str, default=None,
+                        help='Baseline JSON report to diff against')
+    parser.add_argument('--tolerance', type=float, default=0.1,
+                        help='Relative change counted as a regression (default: 0.1)')
+
+    args = parser.parse_args()
+
+    report = {'environment': environment_info(), 'results': []}
+    with tempfile.TemporaryDirectory() as workdir:
+        print(f"Generating {args.images} synthetic {args.width}x{args.height} images "
+              f"and a {args.video_frames}-frame video...")
+        image_paths = make_synthetic_images(Path(workdir) / 'images', args.images,
+                                            args.width, args.height)
+        video_path = make_synthetic_video(Path(workdir) / 'video.mp4', args.video_frames,
+                                          args.width, args.height)
+
+        for model_path in args.models:
+            for imgsz in args.imgsz:
+                print(f"Benchmarking {model_path} @ imgsz {imgsz}...")
+                record = _run_isolated(bench_config, model_path, imgsz, image_paths, video_path,
+                                       args.conf, args.batch, args.workers, args.repeats)
+                report['results'].append(record)
+                stages = ', '.join(f"{stage} {ms:.1f}" for stage, ms in record['stages_ms'].items())
+                print(f"  load {record['model_load_s']:.2f} s | "
+                      f"detect_image {record['detect_image_ips']:.1f} img/s | "
+                      f"batch_process {record['batch_process_ips']:.1f} img/s | "
+                      f"detect_video {record['detect_video_fps']:.1f} fps | "
+                      f"peak RSS {record['peak_rss_mb']:.0f} MB")
+                print(f"  stages (ms/img): {stages}")
+
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nBenchmark report saved to: {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare_runs(report, baseline, args.tolerance)
+        print(f"\n{regressions} regression(s) beyond {args.tolerance:.0%}")
+        if regressions:
+            # Non-zero exit so CI jobs fail on a regression
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
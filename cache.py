@@ -0,0 +1,163 @@
+"""
+Content-addressed on-disk cache of raw detections
+"""
+
+import copy
+import hashlib
+import io
+import os
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Optional
+
+import numpy as np
+
+
+def _hash_file(path: str) -> str:
+    digest = hashlib.sha256()
+    # Exported models such as OpenVINO are directories of files
+    files = sorted(p for p in Path(path).rglob('*') if p.is_file()) if os.path.isdir(path) else [path]
+    for file in files:
+        with open(file, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+
+@lru_cache(maxsize=32)
+def _hash_file_cached(path: str, mtime_ns: int, size: int) -> str:
+    return _hash_file(path)
+
+
+def weights_hash(model_path: str) -> str:
+    """SHA-256 of a weights file (or export directory), memoized until it changes"""
+    stat = os.stat(model_path)
+    return _hash_file_cached(str(Path(model_path).resolve()), stat.st_mtime_ns, stat.st_size)
+
+
+class DetectionCache:
+    """
+    Detections keyed by image bytes, model weights, confidence and imgsz
+
+    Entries are float32 arrays of [x1, y1, x2, y2, conf, cls] rows stored
+    as .npy files. Reading an entry bumps its mtime, and when the cache
+    grows past max_bytes the least recently used entries are deleted.
+
+    Several processes can share one cache directory; give each its own
+    instance from share(), so their writes together stay within max_bytes.
+    """
+
+    def __init__(self, cache_dir: str, model_path: str, conf_threshold: float,
+                 imgsz: int, max_bytes: int = 1 << 30, variant: str = ''):
+        """
+        Args:
+            cache_dir: Directory holding the cache entries
+            model_path: Weights file the detections come from
+            conf_threshold: Confidence threshold used for inference
+            imgsz: Inference image size
+            max_bytes: Size budget before least recently used entries are evicted
+            variant: Extra settings that change the detections (e.g. tiling)
+        """
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._prefix = f"{weights_hash(model_path)}:{conf_threshold:.4f}:{imgsz}:{variant}:".encode()
+        self._size = sum(entry.stat().st_size for entry in self.cache_dir.glob('*/*.npy'))
+        self._writers = 1
+        self._limit = max_bytes
+
+    def key(self, image_bytes: bytes) -> str:
+        """Cache key for the encoded bytes of an image"""
+        return hashlib.sha256(self._prefix + image_bytes).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}.npy"
+
+    def get(self, key: str) -> Optional[Dict[str, np.ndarray]]:
+        """
+        Look up cached detections
+
+        Returns:
+            Detections in the format of utils.extract_detections, or None
+        """
+        path = self._path(key)
+        try:
+            data = np.load(path)
+            os.utime(path)
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return {
+            'xyxy': data[:, :4],
+            'conf': data[:, 4],
+            'cls': data[:, 5].astype(np.int64),
+        }
+
+    def put(self, key: str, detections: Dict[str, np.ndarray]):
+        """Store detections under key, evicting old entries if over budget"""
+        data = np.column_stack([detections['xyxy'], detections['conf'],
+                                detections['cls']]).astype(np.float32)
+        buffer = io.BytesIO()
+        np.save(buffer, data)
+
+        path = self._path(key)
+        path.parent.mkdir(exist_ok=True)
+        try:
+            # Overwriting an entry only adds the difference
+            self._size -= path.stat().st_size
+        except OSError:
+            pass
+        tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        tmp_path.write_bytes(buffer.getvalue())
+        os.replace(tmp_path, path)
+
+        self._size += buffer.tell()
+        if self._size > self._limit:
+            self._evict()
+
+    def share(self, writers: int) -> 'DetectionCache':
+        """
+        Copy of this cache for one of several processes writing to it at once
+
+        Each process only sees its own writes, so each gets an equal share
+        of the remaining budget before it rescans the directory and evicts.
+        """
+        shared = copy.copy(self)
+        shared._writers = max(int(writers), 1)
+        shared._update_limit()
+        return shared
+
+    def _update_limit(self):
+        self._limit = self._size + max(self.max_bytes - self._size, 0) // self._writers
+
+    def _evict(self):
+        """Delete least recently used entries down to 90% of the budget"""
+        entries = []
+        for path in self.cache_dir.glob('*/*.npy'):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        entries.sort()
+
+        self._size = sum(size for _, size, _ in entries)
+        target = int(self.max_bytes * 0.9)
+        for _, size, path in entries:
+            if self._size <= target:
+                break
+            try:
+                path.unlink()
+            except OSError:
+                continue
+            self._size -= size
+        self._update_limit()
+
+    def stats(self) -> str:
+        """Human-readable hit/miss summary"""
+        total = self.hits + self.misses
+        rate = self.hits / total if total else 0.0
+        return f"Cache: {self.hits} hits, {self.misses} misses ({rate:.1%} hit rate)"
@@ -0,0 +1,112 @@
+"""
+Threaded frame capture for live video sources
+"""
+
+import threading
+import time
+
+import cv2
+
+
+class LatestFrameReader:
+    """
+    Read frames from a video source on a background thread
+
+    Only the newest frame is kept: if the consumer is slower than the
+    source, older unread frames are dropped instead of queueing up, so the
+    frame handed to the model is always as fresh as possible.
+    """
+
+    def __init__(self, source, pace: bool = False, notify: threading.Event = None):
+        """
+        Args:
+            source: Camera index, video file path or stream URL
+            pace: Deliver frames at the source's frame rate, so a video file
+                behaves like a live feed instead of being read flat out
+            notify: Event set whenever a new frame arrives or the source ends,
+                for consumers waiting on several readers at once
+        """
+        self.source = source
+        self.pace = pace
+        self.notify = notify
+        self.cap = cv2.VideoCapture(source)
+        self.cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        self._cond = threading.Condition()
+        self._thread = None
+        self._running = False
+        self._frame = None
+        self._timestamp = 0.0
+        self._frame_id = 0
+        self._last_read_id = 0
+        self.ended = False
+        self.frames_captured = 0
+        self.frames_dropped = 0
+
+    def isOpened(self) -> bool:
+        return self.cap.isOpened()
+
+    def start(self):
+        """Start the capture thread"""
+        self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        frame_time = 1.0 / (self.cap.get(cv2.CAP_PROP_FPS) or 30.0)
+        next_frame_at = time.perf_counter()
+        while self._running:
+            if self.pace:
+                delay = next_frame_at - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                next_frame_at += frame_time
+            ret, frame = self.cap.read()
+            timestamp = time.perf_counter()
+            with self._cond:
+                if not ret:
+                    self.ended = True
+                    self._cond.notify_all()
+                    if self.notify is not None:
+                        self.notify.set()
+                    break
+                if self._frame_id > self._last_read_id:
+                    self.frames_dropped += 1
+                self._frame = frame
+                self._timestamp = timestamp
+                self._frame_id += 1
+                self.frames_captured += 1
+                self._cond.notify_all()
+            if self.notify is not None:
+                self.notify.set()
+
+    @property
+    def last_read_id(self) -> int:
+        """Sequence number (1-based) of the frame last returned by read"""
+        return self._last_read_id
+
+    def read(self, timeout: float = 1.0):
+        """
+        Wait for a frame newer than the last one returned
+
+        Args:
+            timeout: Seconds to wait for a new frame
+
+        Returns:
+            Tuple (ok, frame, capture_timestamp); ok is False when the
+            source has ended or no new frame arrived within the timeout
+        """
+        with self._cond:
+            self._cond.wait_for(lambda: self._frame_id > self._last_read_id or self.ended,
+                                timeout=timeout)
+            if self._frame_id <= self._last_read_id:
+                return False, None, 0.0
+            self._last_read_id = self._frame_id
+            return True, self._frame, self._timestamp
+
+    def stop(self):
+        """Stop the capture thread and release the source"""
+        self._running = False
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+        self.cap.release()
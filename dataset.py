@@ -0,0 +1,70 @@
+"""
+Helpers for dataset YAML configs (see dataset_example.yaml)
+"""
+
+from pathlib import Path
+from typing import Dict, List
+
+import yaml
+
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.webp'}
+
+
+def load_dataset_config(data_config: str) -> Dict:
+    """
+    Load a dataset YAML and resolve its root directory
+
+    A relative 'path' is resolved against the working directory first and
+    then against the YAML file's own directory.
+
+    Returns:
+        The parsed config with 'path' replaced by an absolute Path
+    """
+    data_config = Path(data_config)
+    with open(data_config) as f:
+        config = yaml.safe_load(f) or {}
+
+    root = Path(config.get('path') or '.')
+    if not root.is_absolute() and not root.exists():
+        root = data_config.parent / root
+    config['path'] = root.resolve()
+    return config
+
+
+def split_images(config: Dict, split: str = 'val') -> List[Path]:
+    """
+    List the image files of a dataset split
+
+    A split entry may be a directory, a .txt file listing images, a single
+    image, or a list of any of these, relative to the dataset root.
+
+    Args:
+        config: Output of load_dataset_config
+        split: 'train', 'val' or 'test'
+
+    Returns:
+        Sorted list of image paths (empty if the split is not defined)
+    """
+    entries = config.get(split)
+    if not entries:
+        return []
+    if not isinstance(entries, (list, tuple)):
+        entries = [entries]
+
+    root = config['path']
+    images = []
+    for entry in entries:
+        entry = Path(entry)
+        if not entry.is_absolute():
+            entry = root / entry
+        if entry.is_dir():
+            images.extend(p for p in entry.rglob('*') if p.suffix.lower() in IMAGE_EXTENSIONS)
+        elif entry.suffix == '.txt' and entry.exists():
+            for line in entry.read_text().splitlines():
+                line = line.strip()
+                if line:
+                    image = Path(line)
+                    images.append(image if image.is_absolute() else root / image)
+        elif entry.suffix.lower() in IMAGE_EXTENSIONS and entry.exists():
+            images.append(entry)
+    return sorted(images)
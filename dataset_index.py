@@ -0,0 +1,347 @@
+"""
+Dataset integrity checks and statistics for a dataset YAML
+
+Scans every image/label pair of the train, val and test splits in parallel:
+images are checked from their headers without decoding pixels, label
+files are validated against the config's class names, and class and box
+size statistics are collected. Results are stored per split so unchanged
+files are not re-inspected on the next run, and can be written out as the
+label caches ultralytics loads instead of rescanning the dataset.
+"""
+
+import argparse
+import multiprocessing
+import os
+import time
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+from PIL import Image
+
+from dataset import load_dataset_config, split_images
+
+SPLITS = ('train', 'val', 'test')
+
+# Per-image status codes
+OK, MISSING_LABEL, CORRUPT_IMAGE, INVALID_LABEL = 0, 1, 2, 3
+STATUS_NAMES = {OK: 'ok', MISSING_LABEL: 'missing label', CORRUPT_IMAGE: 'corrupt image',
+                INVALID_LABEL: 'invalid label'}
+
+# COCO small/medium/large thresholds on sqrt(box area) in pixels
+SIZE_BUCKETS = (('small', 0, 32), ('medium', 32, 96), ('large', 96, float('inf')))
+
+
+def label_path(image_path: str) -> str:
+    """Label file of an image: the last /images/ directory becomes /labels/, suffix .txt"""
+    images, labels = f"{os.sep}images{os.sep}", f"{os.sep}labels{os.sep}"
+    return labels.join(image_path.rsplit(images, 1)).rsplit('.', 1)[0] + '.txt'
+
+
+def _stat(path: str):
+    try:
+        stat = os.stat(path)
+        return stat.st_mtime_ns, stat.st_size
+    except OSError:
+        return -1, -1
+
+
+def image_header(image_path: str):
+    """
+    Read an image's (height, width) from its header without decoding pixels
+
+    Raises:
+        ValueError: If the file is not a readable image or is truncated
+    """
+    with Image.open(image_path) as image:
+        image.verify()
+        width, height = image.size
+        # EXIF orientations 6 and 8 rotate the image by 90 degrees
+        if image.format == 'JPEG' and image.getexif().get(0x0112) in (6, 8):
+            width, height = height, width
+        image_format = image.format
+    if min(height, width) < 10:
+        raise ValueError(f"image size {width}x{height} is under 10 pixels")
+    if image_format == 'JPEG':
+        with open(image_path, 'rb') as f:
+            f.seek(-2, 2)
+            if f.read() != b'\xff\xd9':
+                raise ValueError("truncated JPEG")
+    return height, width
+
+
+def read_labels(path: str, num_classes: int) -> np.ndarray:
+    """
+    Parse and validate a YOLO label file
+
+    Returns:
+        (n, 5) array of class, x, y, w, h rows with duplicates removed
+
+    Raises:
+        ValueError: On malformed rows, unknown classes or out-of-range boxes
+    """
+    with open(path) as f:
+        rows = [line.split() for line in f.read().strip().splitlines() if line.strip()]
+    if not rows:
+        return np.zeros((0, 5), dtype=np.float32)
+    if any(len(row) != 5 for row in rows):
+        raise ValueError("labels require 5 columns (class x y w h)")
+    labels = np.array(rows, dtype=np.float32)
+    classes = labels[:, 0]
+    if (classes % 1 != 0).any() or (classes < 0).any():
+        raise ValueError(f"non-integer or negative class ids {classes[(classes % 1 != 0) | (classes < 0)]}")
+    if (classes >= num_classes).any():
+        raise ValueError(f"class {int(classes.max())} is not in names (0-{num_classes - 1})")
+    boxes = labels[:, 1:]
+    if boxes.max() > 1.01 or boxes.min() < -0.01:
+        raise ValueError("coordinates are not normalized to 0-1")
+    if (boxes[:, 2:] <= 0).any():
+        raise ValueError("boxes with zero width or height")
+    return np.unique(labels, axis=0)
+
+
+def inspect_pair(args):
+    """Check one image/label pair, returning (shape, status, message, labels)"""
+    image_path, labels_path, num_classes = args
+    try:
+        shape = image_header(image_path)
+    except Exception as e:
+        return (0, 0), CORRUPT_IMAGE, f"{image_path}: corrupt image: {e}", np.zeros((0, 5), np.float32)
+    if not os.path.isfile(labels_path):
+        return shape, MISSING_LABEL, '', np.zeros((0, 5), np.float32)
+    try:
+        labels = read_labels(labels_path, num_classes)
+    except Exception as e:
+        return shape, INVALID_LABEL, f"{labels_path}: {e}", np.zeros((0, 5), np.float32)
+    return shape, OK, '', labels
+
+
+class SplitIndex:
+    """
+    Inspection results for one dataset split
+
+    Per-image arrays are aligned with im_files; labels of image i are
+    labels[offsets[i]:offsets[i + 1]].
+    """
+
+    def __init__(self, im_files, label_files, shapes, status, messages, labels, counts, stats):
+        self.im_files = list(im_files)
+        self.label_files = list(label_files)
+        self.shapes = np.asarray(shapes, dtype=np.int32).reshape(-1, 2)
+        self.status = np.asarray(status, dtype=np.int8)
+        self.messages = list(messages)
+        self.labels = np.asarray(labels, dtype=np.float32).reshape(-1, 5)
+        self.offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+        self.stats = np.asarray(stats, dtype=np.int64).reshape(-1, 4)
+
+    def image_labels(self, i: int) -> np.ndarray:
+        return self.labels[self.offsets[i]:self.offsets[i + 1]]
+
+    def save(self, path: Path):
+        np.savez(path, im_files=np.array(self.im_files), label_files=np.array(self.label_files),
+                 shapes=self.shapes, status=self.status, messages=np.array(self.messages),
+                 labels=self.labels, counts=np.diff(self.offsets), stats=self.stats)
+
+    @classmethod
+    def load(cls, path: Path) -> 'SplitIndex':
+        with np.load(path) as data:
+            return cls(data['im_files'].tolist(), data['label_files'].tolist(), data['shapes'],
+                       data['status'], data['messages'].tolist(), data['labels'],
+                       data['counts'], data['stats'])
+
+    def summary(self, names: Dict[int, str]) -> Dict:
+        """Image status counts, class histogram and box size distribution"""
+        status = {STATUS_NAMES[code]: int((self.status == code).sum()) for code in STATUS_NAMES}
+        classes = np.bincount(self.labels[:, 0].astype(np.int64), minlength=len(names))
+
+        # Box sizes in pixels of the source image
+        heights = np.repeat(self.shapes[:, 0], np.diff(self.offsets))
+        widths = np.repeat(self.shapes[:, 1], np.diff(self.offsets))
+        sizes = np.sqrt(self.labels[:, 3] * widths * self.labels[:, 4] * heights)
+        buckets = {name: int(((sizes >= low) & (sizes < high)).sum()) for name, low, high in SIZE_BUCKETS}
+        percentiles = dict(zip(('p5', 'p50', 'p95'), np.percentile(sizes, [5, 50, 95]).round(1).tolist())) \
+            if len(sizes) else {}
+        return {
+            'images': len(self.im_files),
+            'status': status,
+            'instances': int(len(self.labels)),
+            'classes': {names[i]: int(n) for i, n in enumerate(classes[:len(names)])},
+            'box_sizes': buckets,
+            'box_size_percentiles': percentiles,
+        }
+
+
+def index_split(image_files: List[str], num_classes: int, previous: SplitIndex = None,
+                workers: int = 0) -> SplitIndex:
+    """
+    Inspect the image/label pairs of a split
+
+    Pairs whose image and label files are unchanged since the previous
+    index are reused without being opened.
+
+    Args:
+        image_files: Image paths of the split
+        num_classes: Number of classes in the config's names
+        previous: Earlier index of the same split, if any
+        workers: Worker processes (0 = one per CPU core, 1 = inline)
+    """
+    label_files = [label_path(f) for f in image_files]
+    stats = [_stat(f) + _stat(lb) for f, lb in zip(image_files, label_files)]
+
+    reusable = {}
+    if previous is not None:
+        for i, image_file in enumerate(previous.im_files):
+            reusable[image_file] = i
+    results = [None] * len(image_files)
+    todo = []
+    for i, image_file in enumerate(image_files):
+        j = reusable.get(image_file)
+        if j is not None and tuple(previous.stats[j]) == stats[i]:
+            results[i] = (tuple(previous.shapes[j]), previous.status[j], previous.messages[j],
+                          previous.image_labels(j))
+        else:
+            todo.append(i)
+
+    tasks = [(image_files[i], label_files[i], num_classes) for i in todo]
+    workers = workers or os.cpu_count() or 1
+    if workers > 1 and len(tasks) > 256:
+        context = multiprocessing.get_context('spawn')
+        with context.Pool(workers) as pool:
+            inspected = pool.imap(inspect_pair, tasks, chunksize=64)
+            for i, result in zip(todo, inspected):
+                results[i] = result
+    else:
+        for i, task in zip(todo, tasks):
+            results[i] = inspect_pair(task)
+
+    shapes, status, messages, labels = zip(*results) if results else ((), (), (), ())
+    index = SplitIndex(image_files, label_files, shapes, status, messages,
+                       np.concatenate(labels) if labels else np.zeros((0, 5)),
+                       [len(lb) for lb in labels], stats)
+    index.reused = len(image_files) - len(todo)
+    return index
+
+
+def index_path(data_config: str) -> Path:
+    """Directory holding the index of a dataset config"""
+    data_config = Path(data_config)
+    return data_config.parent / f".{data_config.stem}_index"
+
+
+def index_dataset(data_config: str, workers: int = 0) -> Dict[str, SplitIndex]:
+    """
+    Build or refresh the index of every split defined in a dataset YAML
+
+    Returns:
+        Dict of split name to SplitIndex
+    """
+    config = load_dataset_config(data_config)
+    num_classes = len(config.get('names') or {})
+    directory = index_path(data_config)
+    directory.mkdir(exist_ok=True)
+
+    indexes = {}
+    for split in SPLITS:
+        image_files = sorted(str(f) for f in split_images(config, split))
+        if not image_files:
+            continue
+        split_file = directory / f"{split}.npz"
+        previous = SplitIndex.load(split_file) if split_file.exists() else None
+        start = time.perf_counter()
+        index = index_split(image_files, num_classes, previous, workers)
+        index.save(split_file)
+        print(f"{split}: indexed {len(image_files)} images in {time.perf_counter() - start:.2f}s"
+              + (f" ({index.reused} unchanged since the last run)" if index.reused else ""))
+        indexes[split] = index
+    return indexes
+
+
+def write_training_caches(indexes: Dict[str, SplitIndex], names: Dict[int, str]):
+    """
+    Write the indexed labels as ultralytics label caches
+
+    Training then loads the labels from the cache instead of re-verifying
+    every pair. The cache hash is computed by ultralytics itself, so if its
+    own file listing differs (other image formats, fraction, single_cls)
+    it simply rescans as before.
+    """
+    from types import SimpleNamespace
+
+    from ultralytics.data.dataset import DATASET_CACHE_VERSION, YOLODataset
+    from ultralytics.data.utils import save_dataset_cache_file
+
+    for split, index in indexes.items():
+        usable = [i for i in range(len(index.im_files)) if index.status[i] in (OK, MISSING_LABEL)]
+        if not usable:
+            continue
+        labels = []
+        for i in usable:
+            image_labels = index.image_labels(i)
+            labels.append({
+                'im_file': index.im_files[i],
+                'shape': tuple(int(v) for v in index.shapes[i]),
+                'cls': image_labels[:, 0:1],
+                'bboxes': image_labels[:, 1:],
+                'segments': [],
+                'keypoints': None,
+                'normalized': True,
+                'bbox_format': 'xywh',
+            })
+        dataset = SimpleNamespace(im_files=index.im_files, label_files=index.label_files,
+                                  use_keypoints=False, single_cls=False, data={'names': names})
+        missing = int((index.status == MISSING_LABEL).sum())
+        corrupt = len(index.im_files) - len(usable)
+        found = len(usable) - missing
+        empty = sum(1 for i in usable if index.status[i] == OK and not len(index.image_labels(i)))
+        cache = {
+            'labels': labels,
+            'hash': YOLODataset.get_cache_hash(dataset),
+            'results': (found, missing, empty, corrupt, len(index.im_files)),
+            'msgs': [m for m in index.messages if m],
+        }
+        cache_path = Path(index.label_files[0]).parent.with_suffix('.cache')
+        save_dataset_cache_file(f"{split}: ", cache_path, cache, DATASET_CACHE_VERSION)
+
+
+def print_report(indexes: Dict[str, SplitIndex], names: Dict[int, str], max_messages: int = 10):
+    for split, index in indexes.items():
+        summary = index.summary(names)
+        print(f"\n{split}: {summary['images']} images, {summary['instances']} boxes")
+        print("  " + ", ".join(f"{name}: {count}" for name, count in summary['status'].items()))
+
+        peak = max(summary['classes'].values(), default=0) or 1
+        for name, count in sorted(summary['classes'].items(), key=lambda item: -item[1]):
+            print(f"  {name:>20} {count:>7} {'#' * round(30 * count / peak)}")
+        print("  box sizes: " + ", ".join(f"{k} {v}" for k, v in summary['box_sizes'].items())
+              + (" (sqrt area px " + ", ".join(f"{k} {v}" for k, v in
+                                               summary['box_size_percentiles'].items()) + ")"
+                 if summary['box_size_percentiles'] else ""))
+
+        problems = [m for m in index.messages if m]
+        for message in problems[:max_messages]:
+            print(f"  ! {message}")
+        if len(problems) > max_messages:
+            print(f"  ! ... and {len(problems) - max_messages} more")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Validate a dataset and report its statistics')
+    parser.add_argument('--data', type=str, required=True,
+                        help='Path to dataset YAML configuration file')
+    parser.add_argument('--workers', type=int, default=0,
+                        help='Worker processes (default: one per CPU core)')
+    parser.add_argument('--write-cache', action='store_true',
+                        help='Also write the ultralytics label caches so training skips its scan')
+    args = parser.parse_args()
+
+    names = load_dataset_config(args.data).get('names') or {}
+    if isinstance(names, list):
+        names = dict(enumerate(names))
+    indexes = index_dataset(args.data, args.workers)
+    print_report(indexes, names)
+    if args.write_cache:
+        write_training_caches(indexes, names)
+
+
+if __name__ == '__main__':
+    main()
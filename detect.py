@@ -6,108 +6,519 @@ Supports image, video, and webcam detection using YOLOv8
 import cv2
 import argparse
 from pathlib import Path
-from ultralytics import YOLO
+import math
+import numpy as np
 import os
+import time
 
+from capture import LatestFrameReader
+from tiling import open_large_image, sliced_detect
+from tracking import KeyframeTracker, count_tracks, draw_tracks, tracks_to_detections
+from autotune import apply_threads, tuned_settings
+from backends import BACKENDS, backend_for_path, check_parity
+from cache import DetectionCache
+from detection_store import DetectionWriter
+from metrics import flush_exporter, metrics, start_exporter
+from motion import METHODS, MotionGate, parse_roi
+from multistream import detect_streams
+from registry import get_model
+from utils import (annotate_detections, batch_process, check_roi, count_detections,
+                   crop_roi, detection_labels, empty_detections, filter_variant, load_image,
+                   merge_counts, model_source, offset_detections, parse_box, resolve_classes,
+                   run_inference, write_annotated)
 
-def detect_image(model, image_path, output_dir="output", conf_threshold=0.25):
-    """Detect objects in an image"""
+
+def detect_image(model, image_path, output_dir="output", conf_threshold=0.25,
+                 cache=None, save=True, imgsz=640, tile_size=None, tile_overlap=0.2,
+                 detections_out=None, classes=None, roi=None):
+    """
+    Detect objects in an image (tile by tile when tile_size is set)
+    
+    Tiled and .npy sources are opened with open_large_image, so a .npy array
+    is memory-mapped and only the tiles being inferred are read from disk.
+    classes (ids) and roi (x1, y1, x2, y2) restrict inference as in run_inference.
+    """
     print(f"Processing image: {image_path}")
+    roi = parse_box(roi) if roi is not None else None
     
     # Create output directory if it doesn't exist
     os.makedirs(output_dir, exist_ok=True)
     
+    # Cache hits skip inference (and decoding when nothing is saved)
+    path = Path(image_path)
+    is_array = path.suffix.lower() == '.npy'
+    if tile_size or is_array:
+        detections = key = None
+        if cache is not None and not is_array:
+            _, _, detections, key = load_image(path, cache, decode=False)
+        image = open_large_image(path) if detections is None or save else None
+    else:
+        _, image, detections, key = load_image(path, cache, decode=save)
+    if image is None and detections is None:
+        print(f"Error: Could not read image: {image_path}")
+        return None
+    
     # Run detection
-    results = model(image_path, conf=conf_threshold)
+    if detections is None and not check_roi(roi, image.shape[1], image.shape[0], path.name):
+        detections = empty_detections()
+    elif detections is None and tile_size:
+        crop, offset = crop_roi(image, roi)
+        detections = offset_detections(sliced_detect(model, crop, tile_size, tile_overlap,
+                                                     conf_threshold, imgsz, classes=classes),
+                                       offset)
+        if key is not None:
+            cache.put(key, detections)
+    elif detections is None:
+        detections = run_inference(model, [image], conf_threshold, imgsz, classes, roi)[0]
+        if key is not None:
+            cache.put(key, detections)
+    
+    if detections_out:
+        with DetectionWriter(detections_out, model.names, str(image_path)) as store:
+            store.append(detections, frame=0, label=Path(image_path).name)
     
     # Save results
-    output_path = os.path.join(output_dir, f"detected_{Path(image_path).name}")
-    results[0].save(output_path)
+    output_path = os.path.join(output_dir, f"detected_{path.stem}.jpg" if is_array
+                               else f"detected_{path.name}")
+    if save:
+        # Memory-mapped arrays are read-only, so they are drawn on a copy
+        write_annotated(output_path, np.array(image) if is_array else image,
+                        detections, model.names)
     
     # Print detected objects
     print("\nDetected Objects:")
-    for box in results[0].boxes:
-        class_id = int(box.cls[0])
-        confidence = float(box.conf[0])
-        class_name = model.names[class_id]
+    for class_name, confidence in detection_labels(detections, model.names):
         print(f"  - {class_name}: {confidence:.2%}")
     
-    print(f"\nResult saved to: {output_path}")
-    return results
+    if save:
+        print(f"\nResult saved to: {output_path}")
+    return detections
+
+
+def iter_video_frames(video_path, vid_stride=1, target_fps=None):
+    """
+    Read a video one frame at a time
+    
+    Frames are read and released as they are consumed, so memory stays
+    constant regardless of video length. Every vid_stride-th frame is
+    yielded; with target_fps set, the stride is raised further whenever the
+    consumer is too slow to keep up with that many source frames per second.
+    
+    Args:
+        video_path: Path to the video file
+        vid_stride: Yield every n-th frame
+        target_fps: Source frames per second to keep up with (None = no limit)
+    
+    Yields:
+        Tuples (frame_index, frame)
+    """
+    cap = cv2.VideoCapture(str(video_path))
+    if not cap.isOpened():
+        print(f"Error: Could not open video {video_path}")
+        return
+    
+    vid_stride = max(int(vid_stride), 1)
+    frame_time = None
+    frame_index = -1
+    try:
+        while True:
+            # Skip frames without decoding them
+            stride = vid_stride
+            if target_fps and frame_time:
+                stride = max(stride, math.ceil(frame_time * target_fps))
+            skipped = 0
+            while skipped < stride - 1 and frame_index >= 0:
+                if not cap.grab():
+                    return
+                skipped += 1
+                frame_index += 1
+            
+            with metrics.stage('decode'):
+                ret, frame = cap.read()
+            if not ret:
+                return
+            frame_index += 1
+            
+            start = time.perf_counter()
+            yield frame_index, frame
+            
+            # Smoothed per-frame cost of the consumer (inference, drawing, ...)
+            elapsed = time.perf_counter() - start
+            frame_time = elapsed if frame_time is None else 0.8 * frame_time + 0.2 * elapsed
+    finally:
+        cap.release()
+
+
+def _detect_frame(model, frame, conf_threshold, tracker=None, imgsz=640, gate=None,
+                  classes=None, roi=None):
+    """
+    Detect (or track) objects in one frame, returning (annotated, counts, detections)
+    
+    When the motion gate finds the frame static, the previous detections are
+    drawn again instead of running the model. Without a tracker, classes and
+    roi restrict inference as in run_inference (a tracker has its own).
+    """
+    if gate is not None:
+        with metrics.stage('motion'):
+            infer = gate.should_infer(frame)
+        if not infer:
+            detections = gate.last_detections
+            with metrics.stage('annotate'):
+                return (annotate_detections(frame, detections, model.names),
+                        count_detections(detections, model.names), detections)
+    
+    if tracker is not None:
+        tracks = tracker.process(frame)
+        with metrics.stage('annotate'):
+            annotated, counts, detections = (draw_tracks(frame, tracks, model.names),
+                                             count_tracks(tracks, model.names),
+                                             tracks_to_detections(tracks))
+    else:
+        detections = run_inference(model, [frame], conf_threshold, imgsz, classes, roi)[0]
+        with metrics.stage('annotate'):
+            annotated, counts = (annotate_detections(frame, detections, model.names),
+                                 count_detections(detections, model.names))
+    
+    if gate is not None:
+        gate.last_detections = detections
+    return annotated, counts, detections
+
+
+def iter_video_detections(model, video_path, conf_threshold=0.25, vid_stride=1,
+                          target_fps=None, tracker=None, imgsz=640, gate=None,
+                          classes=None, roi=None, on_frame=None):
+    """
+    Run detection over a video, yielding each frame's detections as they are produced
+    
+    Frames are read as in iter_video_frames and detected as in _detect_frame,
+    so tracking, the motion gate, classes and roi all apply.
+    on_frame(frame_index, annotated_frame, counts) is called before each
+    frame's detections are yielded.
+    
+    Yields:
+        Tuples (frame_index, detections)
+    """
+    for frame_index, frame in iter_video_frames(video_path, vid_stride, target_fps):
+        annotated_frame, counts, detections = _detect_frame(model, frame, conf_threshold,
+                                                            tracker, imgsz, gate, classes, roi)
+        if on_frame is not None:
+            on_frame(frame_index, annotated_frame, counts)
+        yield frame_index, detections
 
 
-def detect_video(model, video_path, output_dir="output", conf_threshold=0.25):
-    """Detect objects in a video"""
+def detect_video(model, video_path, output_dir="output", conf_threshold=0.25,
+                 vid_stride=1, target_fps=None, track_every=1, scene_threshold=0.15,
+                 imgsz=640, detections_out=None, gate=None, classes=None, roi=None):
+    """
+    Detect objects in a video, optionally storing every box in a columnar store
+    
+    With a MotionGate, static frames reuse the previous detections. classes
+    (ids) and roi (x1, y1, x2, y2) restrict inference as in run_inference.
+    """
     print(f"Processing video: {video_path}")
     
     # Create output directory if it doesn't exist
     os.makedirs(output_dir, exist_ok=True)
     
-    # Run detection
-    output_path = os.path.join(output_dir, f"detected_{Path(video_path).name}")
-    results = model(video_path, conf=conf_threshold, save=True, project=output_dir)
+    cap = cv2.VideoCapture(str(video_path))
+    source_fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    width, height = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    cap.release()
+    if roi is not None:
+        roi = parse_box(roi)
+        check_roi(roi, width, height, Path(video_path).name)
+    
+    # Run the detector on keyframes only and track objects in between
+    tracker = None
+    if track_every > 1:
+        tracker = KeyframeTracker(model, conf_threshold, track_every, scene_threshold,
+                                  imgsz=imgsz, classes=classes, roi=roi)
+    
+    # Annotated frames are encoded as they are produced
+    output_path = os.path.join(output_dir, f"detected_{Path(video_path).stem}.mp4")
+    writer = None
+    store = DetectionWriter(detections_out, model.names, str(video_path)) if detections_out else None
+    totals = {}
+    processed = 0
+    vid_stride = max(int(vid_stride), 1)
+    last_index = None
+    last_frame = None
+    
+    def write_frame(frame_index, annotated_frame, counts):
+        nonlocal writer, last_index, last_frame, totals, processed
+        if writer is None:
+            height, width = annotated_frame.shape[:2]
+            writer = cv2.VideoWriter(output_path, cv2.VideoWriter_fourcc(*'mp4v'),
+                                     source_fps / vid_stride, (width, height))
+        with metrics.stage('encode'):
+            # With target_fps the stride grows on the fly; the previous frame
+            # stays on screen for the extra skipped frames to keep real time
+            if last_index is not None:
+                for _ in range(round((frame_index - last_index) / vid_stride) - 1):
+                    writer.write(last_frame)
+            writer.write(annotated_frame)
+        last_index, last_frame = frame_index, annotated_frame
+        
+        totals = merge_counts([totals, counts])
+        processed += 1
+        if processed % 100 == 0:
+            print(f"  frame {frame_index + 1}/{total_frames}: {counts}")
     
-    print(f"\nResult saved to: {output_path}")
-    return results
+    try:
+        for frame_index, detections in iter_video_detections(
+                model, video_path, conf_threshold, vid_stride, target_fps, tracker, imgsz,
+                gate, classes, roi, on_frame=write_frame):
+            if store is not None:
+                store.append(detections, frame=frame_index)
+        
+        # Frames skipped at the end are covered by the last annotated one
+        if writer is not None and total_frames > last_index + 1:
+            with metrics.stage('encode'):
+                for _ in range((total_frames - 1 - last_index) // vid_stride):
+                    writer.write(last_frame)
+    finally:
+        if writer is not None:
+            writer.release()
+        if store is not None:
+            store.close()
+    
+    print(f"\nProcessed {processed} of {total_frames} frames")
+    if gate is not None:
+        print(gate.stats())
+    if store is not None:
+        print(f"Detections stored in: {detections_out} ({store.rows} boxes)")
+    if tracker is not None:
+        print(tracker.stats())
+    print(f"Result saved to: {output_path}")
+    return totals
 
 
-def detect_webcam(model, conf_threshold=0.25, camera_index=0):
+def detect_webcam(model, conf_threshold=0.25, camera_index=0, track_every=1,
+                  scene_threshold=0.15, gate=None, classes=None, roi=None):
     """Detect objects from webcam feed"""
     print("Starting webcam detection... Press 'q' to quit")
     
-    cap = cv2.VideoCapture(camera_index)
+    # Capture runs on its own thread and only keeps the newest frame,
+    # so frames the model cannot keep up with are dropped, not queued
+    reader = LatestFrameReader(camera_index)
     
-    if not cap.isOpened():
+    if not reader.isOpened():
         print(f"Error: Could not open camera {camera_index}")
         return
+    if roi is not None:
+        roi = parse_box(roi)
+        check_roi(roi, int(reader.cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+                  int(reader.cap.get(cv2.CAP_PROP_FRAME_HEIGHT)), f"camera {camera_index}")
+    
+    tracker = None
+    if track_every > 1:
+        tracker = KeyframeTracker(model, conf_threshold, track_every, scene_threshold,
+                                  classes=classes, roi=roi)
+    
+    reader.start()
+    latencies = []
+    last_log = time.perf_counter()
     
     while True:
-        ret, frame = cap.read()
+        ret, frame, captured_at = reader.read()
         if not ret:
-            print("Error: Could not read frame")
-            break
+            if reader.ended:
+                print("Error: Could not read frame")
+                break
+            # No new frame within the timeout: the camera stalled, keep waiting
+            if cv2.waitKey(1) & 0xFF == ord('q'):
+                break
+            continue
         
-        # Run detection
-        results = model(frame, conf=conf_threshold, verbose=False)
+        # Run detection and draw results on frame
+        annotated_frame, _, _ = _detect_frame(model, frame, conf_threshold, tracker, gate=gate,
+                                              classes=classes, roi=roi)
         
-        # Draw results on frame
-        annotated_frame = results[0].plot()
+        # End-to-end latency: capture -> detection -> drawing
+        latency_ms = (time.perf_counter() - captured_at) * 1000
+        latencies.append(latency_ms)
+        cv2.putText(annotated_frame,
+                    f"latency: {latency_ms:.0f} ms  dropped: {reader.frames_dropped}",
+                    (10, 25), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 255), 2)
         
         # Display frame
-        cv2.imshow('Object Detection', annotated_frame)
+        with metrics.stage('display'):
+            cv2.imshow('Object Detection', annotated_frame)
+        
+        now = time.perf_counter()
+        if now - last_log >= 5.0:
+            print(f"Latency avg {sum(latencies) / len(latencies):.0f} ms, "
+                  f"max {max(latencies):.0f} ms over {len(latencies)} frames; "
+                  f"{reader.frames_dropped} frames dropped so far")
+            latencies.clear()
+            last_log = now
         
         # Press 'q' to quit
         if cv2.waitKey(1) & 0xFF == ord('q'):
             break
     
-    cap.release()
+    reader.stop()
     cv2.destroyAllWindows()
-    print("Webcam detection stopped")
+    print(f"Webcam detection stopped ({reader.frames_captured} frames captured, "
+          f"{reader.frames_dropped} dropped)")
+    if tracker is not None:
+        print(tracker.stats())
+    if gate is not None:
+        print(gate.stats())
+
+
+def _parity_images(source, limit=4):
+    """A few images from the source (or synthetic frames) for parity checks"""
+    source_path = Path(source)
+    image_extensions = {'.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.webp'}
+    if source_path.is_dir():
+        images = [str(f) for f in sorted(source_path.iterdir())
+                  if f.suffix.lower() in image_extensions][:limit]
+    elif source_path.suffix.lower() in image_extensions and source_path.exists():
+        images = [str(source_path)]
+    else:
+        images = []
+    if images:
+        return images
+    rng = np.random.default_rng(0)
+    return [rng.integers(0, 255, (480, 640, 3), dtype=np.uint8) for _ in range(limit)]
 
 
 def main():
     parser = argparse.ArgumentParser(description='Object Detection using YOLOv8')
     parser.add_argument('--model', type=str, default='yolov8n.pt',
                         help='Path to model file (default: yolov8n.pt)')
-    parser.add_argument('--source', type=str, required=True,
-                        help='Path to image/video or "webcam" for webcam detection')
+    parser.add_argument('--source', type=str, nargs='+', required=True,
+                        help='Path to image/video/directory or "webcam" for webcam detection; '
+                             'several video files, camera indices or stream URLs run as '
+                             'multi-stream detection with one shared model')
     parser.add_argument('--output', type=str, default='output',
                         help='Output directory (default: output)')
     parser.add_argument('--conf', type=float, default=0.25,
                         help='Confidence threshold (default: 0.25)')
+    parser.add_argument('--backend', type=str, default=None, choices=BACKENDS,
+                        help='Inference backend; onnx/openvino export the model once next to the weights '
+                             '(default: inferred from --model)')
+    parser.add_argument('--check-parity', action='store_true',
+                        help='Compare the backend output against the PyTorch model before running')
+    parser.add_argument('--imgsz', type=int, default=640,
+                        help='Inference image size for image/directory/video sources (default: 640)')
+    parser.add_argument('--tile', type=int, default=None,
+                        help='Image sources: sliced inference with tiles of this size (e.g. 640 for 8K images); '
+                             '.npy sources are memory-mapped and read tile by tile')
+    parser.add_argument('--tile-overlap', type=float, default=0.2,
+                        help='Overlap between neighbouring tiles (default: 0.2)')
+    parser.add_argument('--classes', type=str, nargs='+', default=None,
+                        help='Only detect these classes (names or ids, e.g. car truck bus); '
+                             'others are dropped inside the model\'s NMS')
+    parser.add_argument('--roi', type=parse_box, default=None,
+                        help='Only run the model on this x1,y1,x2,y2 pixel region of every '
+                             'image/frame; boxes are reported in full-frame coordinates')
+    parser.add_argument('--stream-batch', type=int, default=None,
+                        help='Multi-stream: most frames per forward pass (default: one per stream)')
+    parser.add_argument('--duration', type=float, default=None,
+                        help='Multi-stream: stop after this many seconds (default: until all sources end)')
+    parser.add_argument('--motion-gate', type=str, default=None, choices=METHODS,
+                        help='Video/webcam: skip inference on static frames, detecting change by '
+                             'frame differencing (diff) or background subtraction (mog2)')
+    parser.add_argument('--motion-threshold', type=float, default=0.005,
+                        help='Fraction of watched pixels that must change to run the detector (default: 0.005)')
+    parser.add_argument('--motion-roi', type=str, nargs='+', default=None,
+                        help='Regions to watch for motion: x1,y1,x2,y2 rectangles and/or a mask image')
+    parser.add_argument('--motion-max-skip', type=int, default=300,
+                        help='Run the detector at least every n frames (default: 300)')
     parser.add_argument('--camera', type=int, default=0,
                         help='Camera index for webcam (default: 0)')
+    parser.add_argument('--vid-stride', type=int, default=1,
+                        help='Process every n-th video frame (default: 1)')
+    parser.add_argument('--target-fps', type=float, default=None,
+                        help='Skip extra video frames to keep up with this many source frames/s')
+    parser.add_argument('--track-every', type=int, default=1,
+                        help='Video/webcam: run the detector every n-th frame and track in between (default: 1)')
+    parser.add_argument('--scene-threshold', type=float, default=0.15,
+                        help='Frame difference (0-1) that forces a detector keyframe when tracking (default: 0.15)')
+    parser.add_argument('--cache-dir', type=str, default=None,
+                        help='Reuse detections for previously seen images from this directory')
+    parser.add_argument('--cache-size-mb', type=int, default=1024,
+                        help='Detection cache size before old entries are evicted (default: 1024)')
+    parser.add_argument('--no-save', action='store_true',
+                        help='Do not write annotated images for image/directory sources')
+    parser.add_argument('--batch', type=int, default=None,
+                        help='Images per forward pass for directory sources '
+                             '(default: from the autotune profile, else 16)')
+    parser.add_argument('--workers', type=int, default=0,
+                        help='Decode/write threads for directory sources, 0 = sequential (default: 0)')
+    parser.add_argument('--prefetch', type=int, default=2,
+                        help='Batches buffered ahead of and behind the model (default: 2)')
+    parser.add_argument('--recursive', action='store_true',
+                        help='Directory sources: also process images in subdirectories')
+    parser.add_argument('--manifest', type=str, default=None,
+                        help='Directory sources: SQLite progress manifest; reruns skip finished files')
+    parser.add_argument('--detections-out', type=str, default=None,
+                        help='Store every box (frame, class, conf, xyxy) in this columnar store directory')
+    parser.add_argument('--procs', type=int, default=0,
+                        help='Worker processes for directory sources, each loading the model (default: 0)')
+    parser.add_argument('--metrics-file', type=str, default=None,
+                        help='Periodically write per-stage timings to this file (Prometheus text format)')
+    parser.add_argument('--metrics-port', type=int, default=None,
+                        help='Serve per-stage timings on http://0.0.0.0:PORT/metrics')
+    parser.add_argument('--metrics-log', action='store_true',
+                        help='Periodically print a per-stage timing summary')
+    parser.add_argument('--metrics-interval', type=float, default=10.0,
+                        help='Seconds between metrics file writes / log lines (default: 10)')
     
     args = parser.parse_args()
+    sources = args.source
+    args.source = sources[0]
+    
+    if args.metrics_file or args.metrics_port or args.metrics_log:
+        start_exporter(args.metrics_file, args.metrics_port, args.metrics_interval,
+                       args.metrics_log)
+    
+    # Thread counts (and the batch size below) come from the autotune profile if one exists
+    tuned = tuned_settings('inference', args.imgsz)
+    if tuned:
+        apply_threads(tuned)
+        print(f"Using autotune profile: batch {tuned['batch']}, "
+              f"{tuned['threads']}/{tuned['interop_threads']} threads")
     
     # Load model
-    print(f"Loading model: {args.model}")
-    model = YOLO(args.model)
+    load_start = time.perf_counter()
+    backend = args.backend or backend_for_path(args.model)
+    print(f"Loading model: {args.model} ({backend})")
+    model = get_model(args.model, backend, imgsz=args.imgsz)
+    metrics.observe('model_load', time.perf_counter() - load_start)
     print("Model loaded successfully!\n")
     
+    if args.check_parity and backend != backend_for_path(args.model):
+        check_parity(get_model(args.model, 'torch', imgsz=args.imgsz), model, _parity_images(args.source),
+                     args.conf, args.imgsz)
+        print()
+    
+    try:
+        classes = resolve_classes(args.classes, model.names)
+    except ValueError as e:
+        print(f"Error: {e}")
+        return
+    if classes is not None:
+        print(f"Detecting only: {', '.join(model.names[class_id] for class_id in classes)}")
+    
+    gate = None
+    if args.motion_gate:
+        rectangles, mask_path = parse_roi(args.motion_roi)
+        gate = MotionGate(args.motion_gate, args.motion_threshold, roi=rectangles,
+                          mask_path=mask_path, max_skip=args.motion_max_skip)
+    
     # Process based on source type
-    if args.source.lower() == 'webcam':
-        detect_webcam(model, args.conf, args.camera)
+    if len(sources) > 1:
+        detect_streams(model, sources, args.output, args.conf, imgsz=args.imgsz,
+                       max_batch=args.stream_batch, duration=args.duration,
+                       save=not args.no_save, classes=classes, roi=args.roi)
+    elif args.source.lower() == 'webcam':
+        detect_webcam(model, args.conf, args.camera,
+                      track_every=args.track_every, scene_threshold=args.scene_threshold,
+                      gate=gate, classes=classes, roi=args.roi)
     else:
         source_path = Path(args.source)
         if not source_path.exists():
@@ -118,14 +529,40 @@ def main():
         image_extensions = {'.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.webp'}
         video_extensions = {'.mp4', '.avi', '.mov', '.mkv', '.flv', '.wmv'}
         
-        if source_path.suffix.lower() in image_extensions:
-            detect_image(model, args.source, args.output, args.conf)
+        if source_path.is_dir():
+            batch_process(model, args.source, args.output, args.conf,
+                          batch_size=args.batch, imgsz=args.imgsz, workers=args.workers,
+                          prefetch=args.prefetch, processes=args.procs,
+                          cache_dir=args.cache_dir, cache_size_mb=args.cache_size_mb,
+                          save=not args.no_save, recursive=args.recursive,
+                          manifest_path=args.manifest, detections_out=args.detections_out,
+                          classes=classes, roi=args.roi)
+        elif source_path.suffix.lower() in image_extensions | {'.npy'}:
+            cache = None
+            if args.cache_dir:
+                variant = f"tile{args.tile}:{args.tile_overlap}" if args.tile else ''
+                restricted = filter_variant(classes, args.roi)
+                if restricted:
+                    variant = f"{variant}:{restricted}" if variant else restricted
+                cache = DetectionCache(args.cache_dir, model_source(model), args.conf,
+                                       args.imgsz, max_bytes=args.cache_size_mb * 1024 * 1024,
+                                       variant=variant)
+            detect_image(model, args.source, args.output, args.conf,
+                         cache=cache, save=not args.no_save, imgsz=args.imgsz,
+                         tile_size=args.tile, tile_overlap=args.tile_overlap,
+                         detections_out=args.detections_out, classes=classes, roi=args.roi)
         elif source_path.suffix.lower() in video_extensions:
-            detect_video(model, args.source, args.output, args.conf)
+            detect_video(model, args.source, args.output, args.conf,
+                         vid_stride=args.vid_stride, target_fps=args.target_fps,
+                         track_every=args.track_every, scene_threshold=args.scene_threshold,
+                         imgsz=args.imgsz, detections_out=args.detections_out, gate=gate,
+                         classes=classes, roi=args.roi)
         else:
             print(f"Error: Unsupported file format: {source_path.suffix}")
-            print(f"Supported image formats: {image_extensions}")
+            print(f"Supported image formats: {image_extensions} (and .npy arrays)")
             print(f"Supported video formats: {video_extensions}")
+    
+    flush_exporter(args.metrics_file, args.metrics_log)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,237 @@
+"""
+Columnar on-disk storage of raw detections
+
+A store is a directory of NumPy structured-array chunks, one row per
+detection (frame id, track id, class id, confidence, xyxy). Rows are
+buffered and flushed a chunk at a time, so arbitrarily long videos never
+hold more than one chunk in memory, and chunks written before a crash stay
+readable. Frame labels (image paths) are appended to a tab-separated text
+file next to the chunks.
+"""
+
+import argparse
+import json
+import os
+from pathlib import Path
+from typing import Dict, Iterator, List
+
+import numpy as np
+
+DETECTION_DTYPE = np.dtype([
+    ('frame', '<i8'),
+    ('track', '<i4'),
+    ('cls', '<i2'),
+    ('conf', '<f4'),
+    ('x1', '<f4'),
+    ('y1', '<f4'),
+    ('x2', '<f4'),
+    ('y2', '<f4'),
+])
+
+
+def to_records(detections: Dict[str, np.ndarray], frame: int) -> np.ndarray:
+    """
+    Convert a detections dict to structured rows for one frame
+
+    Args:
+        detections: Dict with 'xyxy', 'conf', 'cls' and optionally 'track' arrays
+        frame: Frame id stored on every row
+    """
+    xyxy = np.asarray(detections['xyxy'], dtype=np.float32).reshape(-1, 4)
+    records = np.empty(len(xyxy), dtype=DETECTION_DTYPE)
+    records['frame'] = frame
+    records['track'] = detections.get('track', -1)
+    records['cls'] = detections['cls']
+    records['conf'] = detections['conf']
+    for i, column in enumerate(('x1', 'y1', 'x2', 'y2')):
+        records[column] = xyxy[:, i]
+    return records
+
+
+class DetectionWriter:
+    """
+    Stream detections into a chunked columnar store
+    """
+
+    def __init__(self, path: str, names: Dict[int, str] = None, source: str = None,
+                 chunk_rows: int = 65536, append: bool = False):
+        """
+        Args:
+            path: Store directory
+            names: Class id to name mapping saved with the store
+            source: Description of the input (video path, image directory)
+            chunk_rows: Rows buffered before a chunk is written
+            append: Keep the existing chunks and frame labels and add to them
+                (e.g. when resuming a run); otherwise they are replaced
+        """
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.chunk_rows = chunk_rows
+        self.frames = 0
+        self.rows = 0
+        self._next_frame = 0
+        self._chunks = 0
+        self._buffer: List[np.ndarray] = []
+        self._buffered = 0
+        if append:
+            self._resume()
+        else:
+            for stale in self.path.glob('chunk_*.npy'):
+                stale.unlink()
+        self._labels = open(self.path / 'frames.tsv', 'a' if append else 'w')
+        self._meta = {
+            'dtype': DETECTION_DTYPE.descr,
+            'names': {int(k): v for k, v in (names or {}).items()},
+            'source': source,
+        }
+        self._write_meta()
+
+    def _resume(self):
+        """Continue the chunk numbering, row count and frame ids of an existing store"""
+        chunk_paths = sorted(self.path.glob('chunk_*.npy'))
+        if chunk_paths:
+            self._chunks = int(chunk_paths[-1].stem.split('_')[1]) + 1
+        for chunk_path in chunk_paths:
+            chunk = np.load(chunk_path, mmap_mode='r')
+            self.rows += len(chunk)
+            self._next_frame = max(self._next_frame, int(chunk['frame'].max()) + 1)
+        labels = read_frame_labels(self.path)
+        self.frames = len(labels)
+        if labels:
+            self._next_frame = max(self._next_frame, max(labels) + 1)
+        # Unlabelled frames (videos) are only counted in the metadata
+        if (self.path / 'meta.json').exists():
+            self.frames = max(self.frames, read_meta(self.path).get('frames', 0))
+
+    def append(self, detections: Dict[str, np.ndarray], frame: int = None, label: str = None):
+        """
+        Add one frame's detections
+
+        Args:
+            detections: Dict with 'xyxy', 'conf', 'cls' (and optionally 'track')
+            frame: Frame id; defaults to one past the previous frame
+            label: Optional frame label such as the image path
+        """
+        if frame is None:
+            frame = self._next_frame
+        self._next_frame = frame + 1
+        self.frames += 1
+        if label is not None:
+            self._labels.write(f"{frame}\t{label}\n")
+
+        records = to_records(detections, frame)
+        if not len(records):
+            return
+        self._buffer.append(records)
+        self._buffered += len(records)
+        if self._buffered >= self.chunk_rows:
+            self.flush()
+
+    def flush(self):
+        """Write buffered rows out as a chunk"""
+        self._labels.flush()
+        if not self._buffer:
+            return
+        chunk = np.concatenate(self._buffer)
+        chunk_path = self.path / f"chunk_{self._chunks:06d}.npy"
+        tmp_path = chunk_path.with_suffix('.tmp')
+        with open(tmp_path, 'wb') as f:
+            np.save(f, chunk)
+        os.replace(tmp_path, chunk_path)
+        self._chunks += 1
+        self.rows += len(chunk)
+        self._buffer = []
+        self._buffered = 0
+
+    def close(self):
+        self.flush()
+        self._labels.close()
+        self._meta.update(frames=self.frames, rows=self.rows, chunks=self._chunks)
+        self._write_meta()
+
+    def _write_meta(self):
+        with open(self.path / 'meta.json', 'w') as f:
+            json.dump(self._meta, f, indent=2)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def iter_chunks(path: str, mmap: bool = True) -> Iterator[np.ndarray]:
+    """Yield the store's chunks in write order, memory-mapped by default"""
+    for chunk_path in sorted(Path(path).glob('chunk_*.npy')):
+        yield np.load(chunk_path, mmap_mode='r' if mmap else None)
+
+
+def read_detections(path: str, mmap: bool = True) -> np.ndarray:
+    """
+    Read a whole store as one structured array
+
+    A single-chunk store is returned memory-mapped without copying.
+    """
+    chunks = list(iter_chunks(path, mmap))
+    if not chunks:
+        return np.empty(0, dtype=DETECTION_DTYPE)
+    if len(chunks) == 1:
+        return chunks[0]
+    return np.concatenate(chunks)
+
+
+def read_meta(path: str) -> dict:
+    """Return the store metadata (class names as an int-keyed dict)"""
+    with open(Path(path) / 'meta.json') as f:
+        meta = json.load(f)
+    meta['names'] = {int(k): v for k, v in meta['names'].items()}
+    return meta
+
+
+def read_frame_labels(path: str) -> Dict[int, str]:
+    """Map frame ids to their labels (image paths)"""
+    labels = {}
+    labels_path = Path(path) / 'frames.tsv'
+    if labels_path.exists():
+        with open(labels_path) as f:
+            for line in f:
+                frame, label = line.rstrip('\n').split('\t', 1)
+                labels[int(frame)] = label
+    return labels
+
+
+def class_counts(records: np.ndarray, names: Dict[int, str]) -> Dict[str, int]:
+    """Count detections per class name"""
+    class_ids, counts = np.unique(records['cls'], return_counts=True)
+    return {names.get(int(c), str(c)): int(n) for c, n in zip(class_ids, counts)}
+
+
+def frame_counts(records: np.ndarray, num_frames: int = None) -> np.ndarray:
+    """Number of detections in each frame, indexed by frame id"""
+    return np.bincount(records['frame'], minlength=num_frames or 0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Summarize a detection store')
+    parser.add_argument('path', type=str, help='Store directory written with --detections-out')
+    parser.add_argument('--min-conf', type=float, default=0.0,
+                        help='Only count detections at or above this confidence')
+    args = parser.parse_args()
+
+    meta = read_meta(args.path)
+    total = 0
+    counts = {}
+    for chunk in iter_chunks(args.path):
+        chunk = chunk[chunk['conf'] >= args.min_conf]
+        total += len(chunk)
+        for name, count in class_counts(chunk, meta['names']).items():
+            counts[name] = counts.get(name, 0) + count
+
+    print(f"Source: {meta.get('source')}")
+    print(f"Frames: {meta.get('frames', '?')}, detections: {total}")
+    for name, count in sorted(counts.items(), key=lambda item: -item[1]):
+        print(f"  {name}: {count}")
+
+
+if __name__ == '__main__':
+    main()
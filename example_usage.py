@@ -3,10 +3,11 @@ Example usage of the object detection system
 This script demonstrates various ways to use the detection functionality
 """
 
-from ultralytics import YOLO
 import cv2
 from pathlib import Path
 
+from registry import get_model
+
 
 def example_image_detection():
     """Example: Detect objects in an image"""
@@ -14,7 +15,7 @@ def example_image_detection():
     print("-" * 40)
     
     # Load model
-    model = YOLO('yolov8n.pt')
+    model = get_model('yolov8n.pt')
     
     # For this example, you would use an actual image path
     # image_path = "path/to/your/image.jpg"
@@ -63,9 +64,9 @@ def example_programmatic_usage():
     print("-" * 40)
     
     code_example = '''
-# Load model
-from ultralytics import YOLO
-model = YOLO('yolov8n.pt')
+# Load model (loaded and warmed up once per process, then reused)
+from registry import get_model
+model = get_model('yolov8n.pt')
 
 # Detect objects in an image
 results = model('image.jpg')
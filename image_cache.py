@@ -0,0 +1,262 @@
+"""
+Preprocessed image cache for training and validation
+
+Every epoch the data loader decodes each source image and resizes it so
+its long side matches imgsz before augmentation. The cache does that once:
+resized uint8 images are packed into a single memory-mapped file per
+dataset split and imgsz, with an index recording each source file's mtime
+and size. Entries whose source changed fall back to decoding, and the
+cache is rebuilt on the next run.
+"""
+
+import hashlib
+import math
+import os
+import time
+from pathlib import Path
+from typing import List, Optional
+
+import cv2
+import numpy as np
+from ultralytics.data import YOLODataset
+from ultralytics.models.yolo.detect import DetectionTrainer
+
+from utils import bounded_map
+
+
+def resize_long_side(image: np.ndarray, imgsz: int) -> np.ndarray:
+    """Resize so the long side equals imgsz, as the training data loader does"""
+    h0, w0 = image.shape[:2]
+    r = imgsz / max(h0, w0)
+    if r != 1:
+        size = (min(math.ceil(w0 * r), imgsz), min(math.ceil(h0 * r), imgsz))
+        image = cv2.resize(image, size, interpolation=cv2.INTER_LINEAR)
+    return image
+
+
+def _source_stat(path: str):
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+class ImageCache:
+    """
+    Packed, memory-mapped store of resized images for one split and imgsz
+    """
+
+    def __init__(self, cache_dir: str, image_files: List[str], imgsz: int):
+        """
+        Args:
+            cache_dir: Root directory of all image caches
+            image_files: Source images of the split, in dataset order
+            imgsz: Long-side size the images are resized to
+        """
+        self.image_files = [str(f) for f in image_files]
+        self.imgsz = imgsz
+        digest = hashlib.sha1('\n'.join(self.image_files).encode()).hexdigest()[:16]
+        self.path = Path(cache_dir) / f"imgsz{imgsz}_{digest}"
+        self._positions = {f: i for i, f in enumerate(self.image_files)}
+        self._index = None
+        self._data = None
+
+    @property
+    def data_path(self) -> Path:
+        return self.path / 'images.bin'
+
+    @property
+    def index_path(self) -> Path:
+        return self.path / 'index.npz'
+
+    def stale_files(self) -> int:
+        """Number of sources that are new or changed since the cache was built"""
+        if not self.index_path.exists() or not self.data_path.exists():
+            return len(self.image_files)
+        # Each NpzFile access re-reads the array from the zip, so read it once
+        with np.load(self.index_path) as index:
+            cached = index['stat']
+        current = np.full((len(self.image_files), 2), -1, dtype=np.int64)
+        for i, image_file in enumerate(self.image_files):
+            try:
+                current[i] = _source_stat(image_file)
+            except OSError:
+                pass
+        if len(cached) != len(current):
+            return len(self.image_files)
+        return int(np.count_nonzero((current != cached).any(axis=1) | (current[:, 0] < 0)))
+
+    def build(self, workers: int = 0) -> float:
+        """
+        Decode, resize and pack every source image
+
+        Args:
+            workers: Decode threads (0 = one per CPU core)
+
+        Returns:
+            Build time in seconds
+        """
+        start = time.perf_counter()
+        self.path.mkdir(parents=True, exist_ok=True)
+        count = len(self.image_files)
+        offsets = np.zeros(count, dtype=np.int64)
+        shapes = np.zeros((count, 3), dtype=np.int32)
+        original = np.zeros((count, 2), dtype=np.int32)
+        stats = np.zeros((count, 2), dtype=np.int64)
+
+        def load(image_file):
+            stat = _source_stat(image_file)
+            image = cv2.imread(image_file)
+            return stat, image
+
+        tmp_path = self.data_path.with_suffix('.tmp')
+        offset = 0
+        with open(tmp_path, 'wb') as f:
+            loaded = bounded_map(load, self.image_files, workers or os.cpu_count() or 1,
+                                 prefetch=4 * (workers or os.cpu_count() or 1))
+            for i, (stat, image) in enumerate(loaded):
+                stats[i] = stat
+                if image is None:
+                    # Unreadable sources are left to the data loader to report
+                    offsets[i] = -1
+                    continue
+                original[i] = image.shape[:2]
+                image = np.ascontiguousarray(resize_long_side(image, self.imgsz))
+                offsets[i] = offset
+                shapes[i] = image.shape
+                f.write(image.tobytes())
+                offset += image.nbytes
+        os.replace(tmp_path, self.data_path)
+        np.savez(self.index_path, offsets=offsets, shapes=shapes, original=original, stat=stats)
+        self._index = None
+        self._data = None
+        return time.perf_counter() - start
+
+    def open(self):
+        """Memory-map the packed images and load the index"""
+        if self._index is None:
+            with np.load(self.index_path) as index:
+                self._index = {key: index[key] for key in index.files}
+            self._data = np.memmap(self.data_path, dtype=np.uint8, mode='r') \
+                if self.data_path.stat().st_size else np.zeros(0, dtype=np.uint8)
+        return self
+
+    def get(self, image_file: str):
+        """
+        Return (resized image, original (h, w)) or None if not cached or stale
+
+        The image is copied out of the memory map, so augmentations may
+        modify it freely.
+        """
+        i = self._positions.get(str(image_file))
+        if i is None:
+            return None
+        self.open()
+        offset = self._index['offsets'][i]
+        if offset < 0 or _source_stat(image_file) != tuple(self._index['stat'][i]):
+            return None
+        shape = tuple(self._index['shapes'][i])
+        image = np.array(self._data[offset:offset + int(np.prod(shape))]).reshape(shape)
+        return image, tuple(int(v) for v in self._index['original'][i])
+
+    def __getstate__(self):
+        # Data loader workers reopen the memory map instead of pickling it
+        state = self.__dict__.copy()
+        state['_index'] = None
+        state['_data'] = None
+        return state
+
+    def measure_savings(self, samples: int = 32) -> Optional[float]:
+        """
+        Estimate the seconds saved per pass over the split
+
+        Times decoding + resizing a sample of sources against reading the
+        same images from the cache.
+        """
+        files = self.image_files[::max(1, len(self.image_files) // samples)][:samples]
+        if not files:
+            return None
+        start = time.perf_counter()
+        for image_file in files:
+            image = cv2.imread(image_file)
+            if image is not None:
+                resize_long_side(image, self.imgsz)
+        decode_time = time.perf_counter() - start
+        start = time.perf_counter()
+        for image_file in files:
+            self.get(image_file)
+        cache_time = time.perf_counter() - start
+        return (decode_time - cache_time) / len(files) * len(self.image_files)
+
+
+class CachedYOLODataset(YOLODataset):
+    """
+    YOLODataset whose load_image reads from an ImageCache when it can
+
+    A module-level subclass (rather than a patched instance method) so the
+    dataset still pickles for spawned data loader workers.
+    """
+
+    image_cache = None
+
+    def load_image(self, i, rect_mode=True, resize_short=False):
+        cached = None
+        if (self.image_cache is not None and self.ims[i] is None and rect_mode
+                and not resize_short and self.channels == 3):
+            cached = self.image_cache.get(self.im_files[i])
+        if cached is None:
+            return super().load_image(i, rect_mode, resize_short)
+
+        image, hw_original = cached
+        # Mirror the base class buffering so mosaic can reuse recent images
+        if self.augment:
+            self.ims[i], self.im_hw0[i], self.im_hw[i] = image, hw_original, image.shape[:2]
+            self.buffer.append(i)
+            if 1 < len(self.buffer) >= self.max_buffer_length:
+                j = self.buffer.pop(0)
+                self.ims[j], self.im_hw0[j], self.im_hw[j] = None, None, None
+        return image, hw_original, image.shape[:2]
+
+
+class CachedDetectionTrainer(DetectionTrainer):
+    """
+    Detection trainer whose train and val datasets read from an ImageCache
+
+    Set cache_dir (and optionally cache_workers) on a subclass, see
+    cached_trainer().
+    """
+
+    cache_dir = None
+    cache_workers = 0
+
+    def build_dataset(self, img_path, mode='train', batch=None):
+        dataset = super().build_dataset(img_path, mode, batch)
+        if self.args.cache or type(dataset) is not YOLODataset:
+            # Ultralytics' own RAM/disk caching already covers this split
+            # (other dataset types are left alone)
+            return dataset
+
+        cache = ImageCache(self.cache_dir, dataset.im_files, dataset.imgsz)
+        stale = cache.stale_files()
+        if stale:
+            print(f"Building {mode} image cache for {len(dataset.im_files)} images "
+                  f"({stale} new or changed) in {cache.path}")
+            build_time = cache.build(self.cache_workers)
+            saved = cache.open().measure_savings()
+            report = f"{mode} image cache built in {build_time:.1f}s"
+            if saved is not None and saved > 0:
+                report += (f"; saves ~{saved:.1f}s of decoding per epoch, "
+                           f"paying for itself after {math.ceil(build_time / saved)} epochs")
+            print(report)
+        else:
+            print(f"Using {mode} image cache {cache.path}")
+
+        # Switch to the cache-aware subclass in place instead of building the
+        # dataset (and reading its labels) a second time
+        dataset.__class__ = CachedYOLODataset
+        dataset.image_cache = cache.open()
+        return dataset
+
+
+def cached_trainer(cache_dir: str, workers: int = 0):
+    """Return a CachedDetectionTrainer class bound to cache_dir, for model.train(trainer=...)"""
+    return type('CachedDetectionTrainer', (CachedDetectionTrainer,),
+                {'cache_dir': cache_dir, 'cache_workers': workers})
@@ -0,0 +1,134 @@
+"""
+Load generator for the detection server
+Measures p50/p99 latency and throughput with concurrent clients
+"""
+
+import argparse
+import http.client
+import json
+import socket
+import threading
+import time
+
+import cv2
+import numpy as np
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    """HTTPConnection over a Unix domain socket"""
+
+    def __init__(self, path, timeout=60):
+        super().__init__('localhost', timeout=timeout)
+        self.unix_path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.unix_path)
+
+
+def make_payload(image_path=None, width=640, height=480):
+    """Encoded JPEG bytes from a file, or a synthetic test image"""
+    if image_path:
+        with open(image_path, 'rb') as f:
+            return f.read()
+    image = np.full((height, width, 3), (230, 216, 173), dtype=np.uint8)
+    cv2.rectangle(image, (100, 100), (300, 300), (0, 0, 255), -1)
+    cv2.circle(image, (450, 250), 100, (0, 128, 0), -1)
+    return cv2.imencode('.jpg', image)[1].tobytes()
+
+
+def run_load(payload, requests=200, concurrency=8, host='127.0.0.1', port=8000,
+             unix_socket=None):
+    """
+    Send requests from concurrent clients and collect latencies
+
+    Returns:
+        Dictionary with request count, errors, throughput and latency percentiles (ms)
+    """
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    counter = iter(range(requests))
+
+    def client():
+        if unix_socket:
+            conn = UnixHTTPConnection(unix_socket)
+        else:
+            conn = http.client.HTTPConnection(host, port, timeout=60)
+        while True:
+            with lock:
+                if next(counter, None) is None:
+                    break
+            start = time.perf_counter()
+            try:
+                conn.request('POST', '/detect', body=payload,
+                             headers={'Content-Type': 'application/octet-stream'})
+                response = conn.getresponse()
+                json.loads(response.read())
+                ok = response.status == 200
+            except (OSError, http.client.HTTPException, ValueError):
+                conn.close()
+                ok = False
+            elapsed = (time.perf_counter() - start) * 1000
+            with lock:
+                if ok:
+                    latencies.append(elapsed)
+                else:
+                    errors[0] += 1
+        conn.close()
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    duration = time.perf_counter() - start
+
+    stats = {
+        'requests': len(latencies),
+        'errors': errors[0],
+        'throughput_rps': len(latencies) / duration if duration else 0.0,
+    }
+    if latencies:
+        stats.update({
+            'p50_ms': float(np.percentile(latencies, 50)),
+            'p90_ms': float(np.percentile(latencies, 90)),
+            'p99_ms': float(np.percentile(latencies, 99)),
+            'max_ms': max(latencies),
+        })
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load generator for server.py')
+    parser.add_argument('--host', type=str, default='127.0.0.1',
+                        help='Server host (default: 127.0.0.1)')
+    parser.add_argument('--port', type=int, default=8000,
+                        help='Server port (default: 8000)')
+    parser.add_argument('--unix-socket', type=str, default=None,
+                        help='Connect to a Unix socket path instead of TCP')
+    parser.add_argument('--image', type=str, default=None,
+                        help='Image to send (default: synthetic 640x480 image)')
+    parser.add_argument('--requests', type=int, default=200,
+                        help='Total number of requests (default: 200)')
+    parser.add_argument('--concurrency', type=int, default=8,
+                        help='Number of concurrent clients (default: 8)')
+
+    args = parser.parse_args()
+
+    payload = make_payload(args.image)
+    print(f"Sending {args.requests} requests with {args.concurrency} concurrent clients...")
+    stats = run_load(payload, args.requests, args.concurrency, args.host, args.port,
+                     args.unix_socket)
+
+    print(f"\nCompleted: {stats['requests']}, errors: {stats['errors']}")
+    print(f"Throughput: {stats['throughput_rps']:.1f} requests/s")
+    if stats['requests']:
+        print(f"Latency p50: {stats['p50_ms']:.1f} ms, p90: {stats['p90_ms']:.1f} ms, "
+              f"p99: {stats['p99_ms']:.1f} ms, max: {stats['max_ms']:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Progress manifest for resumable batch processing
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+
+class Manifest:
+    """
+    SQLite record of processed files and their object counts
+
+    A file counts as done while its mtime and size match the recorded
+    values, so reruns skip finished files, pick up new ones and redo files
+    that changed. Records are committed every commit_every files, which
+    bounds the work lost if a run dies.
+    """
+
+    def __init__(self, path: str, commit_every: int = 64):
+        """
+        Args:
+            path: SQLite database file (created if missing)
+            commit_every: Records buffered between commits
+        """
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.commit_every = commit_every
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS processed ('
+            ' path TEXT PRIMARY KEY, mtime_ns INTEGER, size INTEGER,'
+            ' counts TEXT, processed_at REAL)')
+        self._conn.commit()
+
+    def lookup(self, path: Path, stat: os.stat_result = None) -> Optional[Dict[str, int]]:
+        """
+        Return the recorded counts if path was processed and is unchanged
+
+        Args:
+            path: Image file
+            stat: os.stat result of the file (fetched if not given)
+        """
+        stat = stat or path.stat()
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT mtime_ns, size, counts FROM processed WHERE path = ?',
+                (str(path.resolve()),)).fetchone()
+        if row is None or row[0] != stat.st_mtime_ns or row[1] != stat.st_size:
+            return None
+        return json.loads(row[2])
+
+    def record(self, path: Path, counts: Dict[str, int], stat: os.stat_result = None):
+        """Mark path as processed with its object counts"""
+        stat = stat or path.stat()
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO processed VALUES (?, ?, ?, ?, ?)',
+                (str(path.resolve()), stat.st_mtime_ns, stat.st_size,
+                 json.dumps(counts), time.time()))
+            self._pending += 1
+            if self._pending >= self.commit_every:
+                self._conn.commit()
+                self._pending = 0
+
+    def flush(self):
+        """Commit buffered records"""
+        with self._lock:
+            self._conn.commit()
+            self._pending = 0
+
+    def close(self):
+        self.flush()
+        self._conn.close()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*) FROM processed').fetchone()[0]
@@ -0,0 +1,221 @@
+"""
+Per-stage timing metrics with Prometheus text export
+
+Stages are timed with `with metrics.stage('decode'): ...`. While metrics
+are disabled (the default) stage() returns a shared no-op context
+manager, so instrumented code pays almost nothing.
+"""
+
+import bisect
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List
+
+# Histogram bucket upper bounds in seconds
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class _NullStage:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_STAGE = _NullStage()
+
+
+class _StageTimer:
+    __slots__ = ('_metrics', '_name', '_start')
+
+    def __init__(self, metrics, name):
+        self._metrics = metrics
+        self._name = name
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._metrics.observe(self._name, time.perf_counter() - self._start)
+        return False
+
+
+class Histogram:
+    """Bucketed latency distribution of one stage"""
+
+    def __init__(self):
+        self.counts: List[int] = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, seconds: float):
+        self.counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+
+    def quantile(self, q: float) -> float:
+        """Approximate quantile (upper bound of the bucket it falls in)"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        cumulative = 0
+        for bound, count in zip(BUCKETS + (float('inf'),), self.counts):
+            cumulative += count
+            if cumulative >= rank:
+                return bound
+        return float('inf')
+
+
+class StageMetrics:
+    """Thread-safe collection of per-stage latency histograms"""
+
+    def __init__(self):
+        self.enabled = False
+        self._lock = threading.Lock()
+        self._histograms: Dict[str, Histogram] = {}
+
+    def stage(self, name: str):
+        """Context manager timing one execution of a stage"""
+        if not self.enabled:
+            return _NULL_STAGE
+        return _StageTimer(self, name)
+
+    def observe(self, name: str, seconds: float):
+        """Record a stage duration measured elsewhere"""
+        if not self.enabled:
+            return
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = Histogram()
+            histogram.observe(seconds)
+
+    def observe_result(self, result):
+        """Record the preprocess/inference/NMS split ultralytics measures per image"""
+        if not self.enabled:
+            return
+        speed = getattr(result, 'speed', None) or {}
+        for key, name in (('preprocess', 'preprocess'), ('inference', 'inference'),
+                          ('postprocess', 'nms')):
+            if speed.get(key) is not None:
+                self.observe(name, speed[key] / 1000)
+
+    def snapshot(self) -> Dict[str, tuple]:
+        """Picklable copy of the histograms, e.g. to send from a worker process"""
+        with self._lock:
+            return {name: (list(h.counts), h.count, h.total)
+                    for name, h in self._histograms.items()}
+
+    def merge(self, snapshot: Dict[str, tuple]):
+        """Add histograms from another process's snapshot"""
+        with self._lock:
+            for name, (counts, count, total) in snapshot.items():
+                histogram = self._histograms.get(name)
+                if histogram is None:
+                    histogram = self._histograms[name] = Histogram()
+                histogram.counts = [a + b for a, b in zip(histogram.counts, counts)]
+                histogram.count += count
+                histogram.total += total
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+
+    def to_prometheus(self) -> str:
+        """Render all histograms in the Prometheus text exposition format"""
+        lines = [
+            '# HELP detection_stage_seconds Time spent per detection pipeline stage',
+            '# TYPE detection_stage_seconds histogram',
+        ]
+        with self._lock:
+            for name, histogram in sorted(self._histograms.items()):
+                cumulative = 0
+                for bound, count in zip(BUCKETS, histogram.counts):
+                    cumulative += count
+                    lines.append(f'detection_stage_seconds_bucket{{stage="{name}",le="{bound}"}} '
+                                 f'{cumulative}')
+                lines.append(f'detection_stage_seconds_bucket{{stage="{name}",le="+Inf"}} '
+                             f'{histogram.count}')
+                lines.append(f'detection_stage_seconds_sum{{stage="{name}"}} {histogram.total:.6f}')
+                lines.append(f'detection_stage_seconds_count{{stage="{name}"}} {histogram.count}')
+        return '\n'.join(lines) + '\n'
+
+    def write_prometheus(self, path: str):
+        """Atomically write the Prometheus text format to a file (node-exporter textfile style)"""
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            f.write(self.to_prometheus())
+        os.replace(tmp_path, path)
+
+    def summary_line(self) -> str:
+        """One-line overview: mean and approximate p99 per stage in ms"""
+        with self._lock:
+            parts = [f"{name} n={h.count} mean={1000 * h.total / h.count:.1f}ms "
+                     f"p99<={1000 * h.quantile(0.99):.1f}ms"
+                     for name, h in sorted(self._histograms.items()) if h.count]
+        return 'Stage timings: ' + ('; '.join(parts) if parts else 'no samples')
+
+
+metrics = StageMetrics()
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path != '/metrics':
+            self.send_error(404)
+            return
+        body = metrics.to_prometheus().encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_exporter(path: str = None, port: int = None, interval: float = 10.0,
+                   log: bool = False):
+    """
+    Enable metrics and export them in the background
+
+    Args:
+        path: Rewrite this file with the Prometheus text format every interval
+        port: Serve GET /metrics on this port
+        interval: Seconds between file writes / log lines
+        log: Print a summary line every interval
+    """
+    metrics.enabled = True
+
+    if port:
+        server = ThreadingHTTPServer(('0.0.0.0', port), _MetricsHandler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        print(f"Serving metrics on http://0.0.0.0:{port}/metrics")
+
+    if path or log:
+        def export_loop():
+            while True:
+                time.sleep(interval)
+                if path:
+                    metrics.write_prometheus(path)
+                if log:
+                    print(metrics.summary_line())
+
+        threading.Thread(target=export_loop, daemon=True).start()
+
+
+def flush_exporter(path: str = None, log: bool = False):
+    """Write the final metrics at the end of a run"""
+    if not metrics.enabled:
+        return
+    if path:
+        metrics.write_prometheus(path)
+        print(f"Metrics written to: {path}")
+    if log:
+        print(metrics.summary_line())
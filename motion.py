@@ -0,0 +1,142 @@
+"""
+Motion gating: skip inference on frames where nothing moved
+
+Frames are reduced to small blurred grayscale thumbnails and compared
+either against the last frame the detector ran on (frame differencing) or
+against a learned background model (MOG2). When the changed area inside
+the region of interest stays below a threshold, the caller reuses the
+previous detections instead of running the model.
+"""
+
+from pathlib import Path
+from typing import List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+METHODS = ('diff', 'mog2')
+
+
+def parse_roi(specs: Sequence[str]) -> Tuple[List[Tuple[int, int, int, int]], Optional[str]]:
+    """
+    Split ROI arguments into pixel rectangles and an optional mask image
+
+    Args:
+        specs: Items that are either "x1,y1,x2,y2" or a mask image path
+            (non-zero pixels are watched)
+
+    Returns:
+        (rectangles, mask_path)
+    """
+    rectangles, mask_path = [], None
+    for spec in specs or ():
+        if Path(spec).is_file():
+            mask_path = spec
+            continue
+        try:
+            x1, y1, x2, y2 = (int(float(v)) for v in spec.split(','))
+        except ValueError:
+            raise ValueError(f"ROI '{spec}' is neither x1,y1,x2,y2 nor an existing mask image")
+        rectangles.append((x1, y1, x2, y2))
+    return rectangles, mask_path
+
+
+class MotionGate:
+    """
+    Decide per frame whether the detector needs to run
+    """
+
+    def __init__(self, method: str = 'diff', threshold: float = 0.005,
+                 pixel_threshold: int = 25, width: int = 160,
+                 roi: Sequence[Tuple[int, int, int, int]] = (), mask_path: str = None,
+                 max_skip: int = 300):
+        """
+        Args:
+            method: 'diff' (against the last inferred frame) or 'mog2' (background subtraction)
+            threshold: Fraction of watched pixels that must change to run the detector
+            pixel_threshold: Grayscale difference (0-255) for a pixel to count as changed
+            width: Width of the thumbnails the check runs on
+            roi: Rectangles (x1, y1, x2, y2, source pixels) to watch; empty = whole frame
+            mask_path: Mask image of watched pixels, combined with roi
+            max_skip: Run the detector at least every max_skip frames regardless
+        """
+        if method not in METHODS:
+            raise ValueError(f"Unknown motion method '{method}', expected one of {METHODS}")
+        self.method = method
+        self.threshold = threshold
+        self.pixel_threshold = pixel_threshold
+        self.width = width
+        self.roi = list(roi)
+        self.mask_path = mask_path
+        self.max_skip = max_skip
+        self.last_detections = None
+        self.frames = 0
+        self.skipped = 0
+        self._mask = None
+        self._reference = None
+        self._since_inference = 0
+        self._subtractor = cv2.createBackgroundSubtractorMOG2(
+            history=500, varThreshold=16, detectShadows=False) if method == 'mog2' else None
+
+    def _thumbnail(self, frame) -> np.ndarray:
+        height, width = frame.shape[:2]
+        size = (self.width, max(1, round(height * self.width / width)))
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+        small = cv2.resize(gray, size, interpolation=cv2.INTER_AREA)
+        return cv2.GaussianBlur(small, (5, 5), 0)
+
+    def _build_mask(self, frame_shape, thumb_shape) -> Optional[np.ndarray]:
+        if not self.roi and not self.mask_path:
+            return None
+        height, width = frame_shape[:2]
+        mask = np.zeros((height, width), dtype=np.uint8)
+        for x1, y1, x2, y2 in self.roi:
+            mask[max(y1, 0):max(y2, 0), max(x1, 0):max(x2, 0)] = 255
+        if self.mask_path:
+            image = cv2.imread(self.mask_path, cv2.IMREAD_GRAYSCALE)
+            if image is None:
+                raise ValueError(f"Could not read ROI mask: {self.mask_path}")
+            image = cv2.resize(image, (width, height), interpolation=cv2.INTER_NEAREST)
+            mask = np.maximum(mask, image) if self.roi else image
+        small = cv2.resize(mask, thumb_shape[::-1], interpolation=cv2.INTER_NEAREST)
+        return small > 0
+
+    def changed_fraction(self, thumbnail: np.ndarray) -> float:
+        """Fraction of watched pixels that changed"""
+        if self._subtractor is not None:
+            changed = self._subtractor.apply(thumbnail) > 0
+        else:
+            changed = cv2.absdiff(thumbnail, self._reference) > self.pixel_threshold
+        if self._mask is not None:
+            return float(changed[self._mask].mean()) if self._mask.any() else 0.0
+        return float(changed.mean())
+
+    def should_infer(self, frame) -> bool:
+        """
+        Check one frame; False means the previous detections still apply
+        """
+        self.frames += 1
+        thumbnail = self._thumbnail(frame)
+        if self._reference is None:
+            self._mask = self._build_mask(frame.shape, thumbnail.shape)
+            if self._subtractor is not None:
+                self._subtractor.apply(thumbnail)
+            self._reference = thumbnail
+            self._since_inference = 0
+            return True
+
+        moved = self.changed_fraction(thumbnail) > self.threshold
+        if moved or self.last_detections is None or self._since_inference >= self.max_skip:
+            self._reference = thumbnail
+            self._since_inference = 0
+            return True
+        self._since_inference += 1
+        self.skipped += 1
+        return False
+
+    def stats(self) -> str:
+        """Human-readable summary of skipped frames"""
+        if not self.frames:
+            return "No frames checked for motion"
+        return (f"Motion gate ({self.method}): skipped inference on {self.skipped}/{self.frames} "
+                f"static frames ({self.skipped / self.frames:.1%})")
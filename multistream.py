@@ -0,0 +1,240 @@
+"""
+Multi-stream detection with one shared model
+
+Each source (camera index, video file or stream URL) gets a capture thread
+that keeps only its newest frame. The detection loop collects the latest
+frame of every stream that has one and runs them through the model as a
+single batch, then hands each annotated frame to that stream's own writer
+thread. Every stream contributes at most one frame per batch, and when
+there are more ready streams than batch slots the starting stream rotates,
+so a fast or busy feed cannot starve the others.
+"""
+
+import os
+import queue
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List
+
+import cv2
+import numpy as np
+
+from capture import LatestFrameReader
+from metrics import metrics
+from utils import annotate_detections, count_detections, merge_counts, run_inference
+
+
+def parse_source(source: str):
+    """Camera indices are given as plain integers"""
+    return int(source) if source.isdigit() else source
+
+
+def stream_name(source, index: int) -> str:
+    """Short name for a stream, used for its output file and in logs"""
+    if isinstance(source, int):
+        return f"camera{source}"
+    stem = Path(str(source).split('?')[0]).stem or 'stream'
+    return f"{index}_{stem}"
+
+
+class StreamWriter:
+    """
+    Encode one stream's annotated frames on a dedicated thread
+
+    A stream whose encoder falls behind only blocks once its own queue is
+    full, instead of delaying every stream's writes.
+    """
+
+    def __init__(self, path: str, fps: float, max_queue: int = 8):
+        self.path = path
+        self.fps = fps
+        self.frames_written = 0
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def write(self, frame, repeats: int = 1):
+        """Queue a frame, written repeats times (standing in for dropped frames)"""
+        self._queue.put((frame, repeats))
+
+    def _run(self):
+        writer = None
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            frame, repeats = item
+            if writer is None:
+                height, width = frame.shape[:2]
+                writer = cv2.VideoWriter(self.path, cv2.VideoWriter_fourcc(*'mp4v'),
+                                         self.fps, (width, height))
+            with metrics.stage('encode'):
+                for _ in range(repeats):
+                    writer.write(frame)
+            self.frames_written += repeats
+        if writer is not None:
+            writer.release()
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+
+
+class Stream:
+    """Capture, output and statistics of one source"""
+
+    def __init__(self, source, index: int, output_dir: str, notify: threading.Event,
+                 save: bool = True):
+        self.source = source
+        self.name = stream_name(source, index)
+        # Files are paced at their frame rate so they behave like live feeds
+        self.reader = LatestFrameReader(source, pace=not isinstance(source, int)
+                                        and os.path.exists(str(source)), notify=notify)
+        fps = self.reader.cap.get(cv2.CAP_PROP_FPS) or 30.0
+        self.writer = StreamWriter(os.path.join(output_dir, f"detected_{self.name}.mp4"),
+                                   fps) if save else None
+        self.processed = 0
+        # Capture sequence number of the last frame written, and that frame
+        self.written_id = 0
+        self.last_annotated = None
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+        self.counts = {}
+
+    def write(self, annotated, frame_id: int):
+        """
+        Write an annotated frame, repeating it for frames dropped since the
+        last one so the video keeps the source frame rate
+        """
+        if self.writer is not None:
+            self.writer.write(annotated, max(1, frame_id - self.written_id))
+        self.written_id = frame_id
+        self.last_annotated = annotated
+
+    def finish(self):
+        """Cover frames captured after the last processed one, then close the writer"""
+        if self.writer is None:
+            return
+        remaining = self.reader.frames_captured - self.written_id
+        if self.last_annotated is not None and remaining > 0:
+            self.writer.write(self.last_annotated, remaining)
+        self.writer.close()
+
+    def report(self) -> str:
+        reader = self.reader
+        latency = self.latency_total / max(self.processed, 1) * 1000
+        return (f"{self.name}: {self.processed} frames processed, "
+                f"{reader.frames_captured} captured, {reader.frames_dropped} dropped, "
+                f"latency avg {latency:.0f} ms / max {self.latency_max * 1000:.0f} ms")
+
+
+def detect_streams(model, sources: List[str], output_dir: str = "output",
+                   conf_threshold: float = 0.25, imgsz: int = 640, max_batch: int = None,
+                   duration: float = None, save: bool = True,
+                   log_interval: float = 10.0, classes: List[int] = None,
+                   roi=None) -> Dict[str, Dict[str, int]]:
+    """
+    Run detection over several streams with one model
+
+    Args:
+        model: YOLO model shared by all streams
+        sources: Camera indices (as strings), video files or stream URLs
+        output_dir: Directory for the per-stream annotated videos
+        conf_threshold: Confidence threshold
+        imgsz: Inference image size
+        max_batch: Most frames per forward pass (None = one per stream)
+        duration: Stop after this many seconds (None = until every source ends)
+        save: Write annotated videos
+        log_interval: Seconds between per-stream status lines
+        classes: Class ids to detect, filtered in the model's NMS (None = all)
+        roi: (x1, y1, x2, y2) region inferred in every stream (None = whole frame)
+
+    Returns:
+        Dictionary mapping stream names to their total object counts
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    notify = threading.Event()
+    streams = []
+    for index, source in enumerate(sources):
+        stream = Stream(parse_source(source), index, output_dir, notify, save)
+        if not stream.reader.isOpened():
+            print(f"Error: Could not open stream {source}, skipping it")
+            if stream.writer is not None:
+                stream.writer.close()
+            continue
+        streams.append(stream)
+    if not streams:
+        return {}
+
+    max_batch = max_batch or len(streams)
+    print(f"Detecting on {len(streams)} streams, up to {max_batch} frames per batch")
+    # Warm up before capture starts so the first batch is not stale
+    model([np.zeros((imgsz, imgsz, 3), dtype=np.uint8)] * max_batch, imgsz=imgsz, verbose=False)
+    for stream in streams:
+        stream.reader.start()
+
+    start = time.perf_counter()
+    last_log = start
+    offset = 0
+    batches = 0
+    try:
+        while True:
+            # Sleep until some reader has a new frame (or ended)
+            notify.wait(timeout=0.5)
+            notify.clear()
+
+            # Newest frame of each stream, starting from a rotating offset
+            batch = []
+            for i in range(len(streams)):
+                position = (offset + i) % len(streams)
+                reader = streams[position].reader
+                ok, frame, captured_at = reader.read(timeout=0)
+                if ok:
+                    batch.append((streams[position], frame, captured_at, reader.last_read_id))
+                    if len(batch) == max_batch:
+                        # Streams left out this time are first in line next time
+                        offset = position + 1
+                        break
+
+            if batch:
+                inferred = run_inference(model, [frame for _, frame, _, _ in batch],
+                                         conf_threshold, imgsz, classes, roi)
+                batches += 1
+                for (stream, frame, captured_at, frame_id), detections in zip(batch, inferred):
+                    with metrics.stage('annotate'):
+                        annotated = annotate_detections(frame, detections, model.names)
+                    stream.counts = merge_counts([stream.counts,
+                                                  count_detections(detections, model.names)])
+                    stream.write(annotated, frame_id)
+                    latency = time.perf_counter() - captured_at
+                    stream.processed += 1
+                    stream.latency_total += latency
+                    stream.latency_max = max(stream.latency_max, latency)
+
+            now = time.perf_counter()
+            if now - last_log >= log_interval:
+                for stream in streams:
+                    print(f"  {stream.report()}")
+                last_log = now
+            if duration is not None and now - start >= duration:
+                break
+            if not batch and all(stream.reader.ended for stream in streams):
+                break
+    except KeyboardInterrupt:
+        print("Interrupted")
+    finally:
+        for stream in streams:
+            stream.reader.stop()
+            stream.finish()
+
+    elapsed = time.perf_counter() - start
+    frames = sum(stream.processed for stream in streams)
+    print(f"\nProcessed {frames} frames in {batches} batches "
+          f"({frames / max(elapsed, 1e-9):.1f} frames/s, "
+          f"{frames / max(batches, 1):.1f} per batch)")
+    for stream in streams:
+        print(f"  {stream.report()}")
+        if stream.writer is not None:
+            print(f"    saved to: {stream.writer.path}")
+    return {stream.name: stream.counts for stream in streams}
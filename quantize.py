@@ -0,0 +1,163 @@
+"""
+Post-training INT8 quantization for trained YOLOv8 models
+Produces ONNX Runtime or OpenVINO INT8 models usable with detect.py --model
+"""
+
+import argparse
+import random
+from pathlib import Path
+
+import cv2
+import numpy as np
+from ultralytics import YOLO
+
+from backends import export_model
+from dataset import load_dataset_config, split_images
+from utils import letterbox
+
+
+def _preprocess(image, imgsz):
+    """Letterbox a BGR image into the model's NCHW float input"""
+    image, _, _ = letterbox(image, imgsz)
+    image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB).transpose(2, 0, 1)
+    return np.ascontiguousarray(image[None], dtype=np.float32) / 255.0
+
+
+def calibration_images(data_config, num_images=300, seed=0):
+    """Draw a fixed random subset of the dataset's val split for calibration"""
+    images = split_images(load_dataset_config(data_config), 'val')
+    if not images:
+        raise ValueError(f"No val images found for calibration in {data_config}")
+    if len(images) > num_images:
+        images = random.Random(seed).sample(images, num_images)
+    return images
+
+
+def quantize_onnx(model_path, data_config, imgsz=640, num_images=300):
+    """
+    Statically quantize a model to INT8 with ONNX Runtime
+    
+    Args:
+        model_path: Path to the FP32 .pt weights
+        data_config: Dataset YAML whose val split is used for calibration
+        imgsz: Input image size
+        num_images: Number of calibration images
+    
+    Returns:
+        Path of the INT8 .onnx model
+    """
+    import onnx
+    from onnxruntime.quantization import (CalibrationDataReader, QuantFormat, QuantType,
+                                          quantize_static)
+    
+    fp32_path = export_model(model_path, 'onnx', imgsz)
+    int8_path = fp32_path.with_name(f"{fp32_path.stem}_int8.onnx")
+    input_name = onnx.load(str(fp32_path), load_external_data=False).graph.input[0].name
+    images = calibration_images(data_config, num_images)
+    
+    class Reader(CalibrationDataReader):
+        def __init__(self):
+            self._images = iter(images)
+        
+        def get_next(self):
+            for image_path in self._images:
+                image = cv2.imread(str(image_path))
+                if image is not None:
+                    return {input_name: _preprocess(image, imgsz)}
+            return None
+    
+    print(f"Calibrating on {len(images)} val images...")
+    quantize_static(str(fp32_path), str(int8_path), Reader(),
+                    quant_format=QuantFormat.QDQ, per_channel=True,
+                    activation_type=QuantType.QUInt8, weight_type=QuantType.QInt8)
+    
+    # Keep the ultralytics metadata (names, stride, imgsz) so the model loads as usual
+    fp32 = onnx.load(str(fp32_path), load_external_data=False)
+    int8 = onnx.load(str(int8_path))
+    del int8.metadata_props[:]
+    int8.metadata_props.extend(fp32.metadata_props)
+    onnx.save(int8, str(int8_path))
+    return int8_path
+
+
+def quantize_openvino(model_path, data_config, imgsz=640):
+    """
+    Quantize a model to INT8 with OpenVINO (NNCF), calibrated on the val split
+    
+    Returns:
+        Path of the INT8 OpenVINO model directory
+    """
+    exported = YOLO(model_path).export(format='openvino', int8=True, data=data_config,
+                                       imgsz=imgsz, dynamic=True)
+    return Path(exported)
+
+
+def evaluate_map(model_path, data_config, imgsz=640):
+    """Return (mAP50, mAP50-95) of a model on the dataset's val split"""
+    metrics = YOLO(str(model_path), task='detect').val(data=data_config, imgsz=imgsz,
+                                                      device='cpu', plots=False,
+                                                      verbose=False)
+    return metrics.box.map50, metrics.box.map
+
+
+def quantize_model(model_path, data_config, fmt='onnx', imgsz=640, num_images=300,
+                   evaluate=True):
+    """
+    Produce an INT8 model and report its accuracy against the FP32 model
+    
+    Args:
+        model_path: Path to the FP32 .pt weights (e.g. model.trainer.best)
+        data_config: Path to dataset YAML configuration file
+        fmt: 'onnx' (ONNX Runtime) or 'openvino'
+        imgsz: Input image size
+        num_images: Number of calibration images (ONNX only)
+        evaluate: Validate both models and print the mAP delta
+    
+    Returns:
+        Path of the INT8 model
+    """
+    print(f"Quantizing {model_path} to INT8 ({fmt})")
+    if fmt == 'onnx':
+        int8_path = quantize_onnx(model_path, data_config, imgsz, num_images)
+    elif fmt == 'openvino':
+        int8_path = quantize_openvino(model_path, data_config, imgsz)
+    else:
+        raise ValueError(f"Unsupported quantization format: {fmt}")
+    print(f"INT8 model saved to: {int8_path}")
+    
+    if evaluate:
+        print("\nEvaluating FP32 and INT8 models on the val split...")
+        fp32_map50, fp32_map = evaluate_map(model_path, data_config, imgsz)
+        int8_map50, int8_map = evaluate_map(int8_path, data_config, imgsz)
+        print(f"  FP32: mAP50 {fp32_map50:.4f}, mAP50-95 {fp32_map:.4f}")
+        print(f"  INT8: mAP50 {int8_map50:.4f}, mAP50-95 {int8_map:.4f}")
+        print(f"  Delta: mAP50 {int8_map50 - fp32_map50:+.4f}, "
+              f"mAP50-95 {int8_map - fp32_map:+.4f}")
+    
+    print(f"\nRun it with: python detect.py --model {int8_path} --source <image>")
+    return int8_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Quantize a YOLOv8 model to INT8')
+    parser.add_argument('--model', type=str, required=True,
+                        help='Path to FP32 .pt weights (e.g. runs/detect/custom_model/weights/best.pt)')
+    parser.add_argument('--data', type=str, required=True,
+                        help='Path to dataset YAML configuration file (val split is used for calibration)')
+    parser.add_argument('--format', type=str, default='onnx', choices=['onnx', 'openvino'],
+                        help='INT8 runtime format (default: onnx)')
+    parser.add_argument('--imgsz', type=int, default=640,
+                        help='Image size (default: 640)')
+    parser.add_argument('--calib-images', type=int, default=300,
+                        help='Number of calibration images (default: 300)')
+    parser.add_argument('--no-eval', action='store_true',
+                        help='Skip the FP32 vs INT8 mAP comparison')
+    
+    args = parser.parse_args()
+    
+    quantize_model(args.model, args.data, args.format, args.imgsz,
+                   args.calib_images, evaluate=not args.no_eval)
+
+
+if __name__ == "__main__":
+    main()
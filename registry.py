@@ -0,0 +1,144 @@
+"""
+In-process registry of loaded models
+
+Entry points and embedding applications ask the registry for a model
+instead of constructing YOLO(...) themselves, so each weights file is
+loaded and warmed up once per process for a given backend and device.
+When the loaded models exceed the memory budget, the least recently used
+ones are released.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+
+from backends import backend_for_path, load_model
+
+# Default budget, overridable with $MODEL_REGISTRY_MB
+DEFAULT_BUDGET_MB = 2048
+
+
+def model_bytes(model, path: Path) -> int:
+    """Approximate memory held by a loaded model"""
+    module = getattr(model, 'model', None)
+    if hasattr(module, 'parameters'):
+        tensors = list(module.parameters()) + list(module.buffers())
+        return sum(t.numel() * t.element_size() for t in tensors)
+    # Exported models: the runtime holds roughly the weights on disk
+    if path.is_dir():
+        return sum(f.stat().st_size for f in path.rglob('*') if f.is_file())
+    return path.stat().st_size if path.exists() else 0
+
+
+class ModelRegistry:
+    """
+    Loaded models keyed by (weights path, backend, device, ONNX threads), in LRU order
+    """
+
+    def __init__(self, max_bytes: int = None):
+        """
+        Args:
+            max_bytes: Memory budget for all loaded models (None = from
+                $MODEL_REGISTRY_MB, default 2 GB)
+        """
+        if max_bytes is None:
+            max_bytes = int(os.environ.get('MODEL_REGISTRY_MB', DEFAULT_BUDGET_MB)) * 1024 * 1024
+        self.max_bytes = max_bytes
+        self._models = OrderedDict()
+        self._loading = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, model_path: str, backend: str = None, device: str = 'cpu',
+            imgsz: int = 640, threads: int = None):
+        """
+        Return a loaded, warmed-up model, loading it on first use
+
+        Loading (and exporting) happens outside the registry lock, so other
+        lookups are not held up; concurrent requests for the same model wait
+        for a single load.
+
+        Args:
+            model_path: Path to .pt weights or an exported model
+            backend: 'torch', 'onnx' or 'openvino' (None = infer from model_path)
+            device: Device the model runs on
+            imgsz: Image size for export and warm-up
+            threads: CPU threads for ONNX Runtime (None = all cores)
+        """
+        backend = backend or backend_for_path(model_path)
+        path = Path(model_path)
+        # Only ONNX Runtime sessions are configured with a thread count
+        key = (str(path.resolve()) if path.exists() else str(model_path), backend, str(device),
+               threads if backend == 'onnx' else None)
+        with self._lock:
+            model = self._lookup(key)
+            if model is not None:
+                return model
+            key_lock = self._loading.setdefault(key, threading.Lock())
+
+        with key_lock:
+            with self._lock:
+                # Loaded by a concurrent caller while this one waited
+                model = self._lookup(key)
+                if model is not None:
+                    return model
+                self.misses += 1
+            try:
+                model = load_model(model_path, backend, imgsz, threads)
+                # Warm up once on the target device; exported backends already did in load_model
+                if backend == 'torch':
+                    model(np.zeros((imgsz, imgsz, 3), dtype=np.uint8), imgsz=imgsz,
+                          device=device, verbose=False)
+                with self._lock:
+                    self._models[key] = (model, model_bytes(model, path))
+                    self._evict(keep=key)
+            finally:
+                with self._lock:
+                    self._loading.pop(key, None)
+            return model
+
+    def _lookup(self, key):
+        entry = self._models.get(key)
+        if entry is None:
+            return None
+        self._models.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def _evict(self, keep):
+        while self.total_bytes() > self.max_bytes and len(self._models) > 1:
+            key = next(k for k in self._models if k != keep)
+            del self._models[key]
+            self.evictions += 1
+            print(f"Model registry: released {key[0]} ({key[1]}) to stay within "
+                  f"{self.max_bytes / 1e6:.0f} MB")
+
+    def total_bytes(self) -> int:
+        return sum(size for _, size in self._models.values())
+
+    def clear(self):
+        with self._lock:
+            self._models.clear()
+
+    def stats(self) -> str:
+        return (f"Model registry: {len(self._models)} loaded "
+                f"({self.total_bytes() / 1e6:.1f} MB), {self.hits} hits, "
+                f"{self.misses} loads, {self.evictions} evictions")
+
+    def __len__(self):
+        return len(self._models)
+
+
+# Process-wide registry used by all entry points
+registry = ModelRegistry()
+
+
+def get_model(model_path: str, backend: str = None, device: str = 'cpu',
+              imgsz: int = 640, threads: int = None):
+    """Shortcut for registry.get"""
+    return registry.get(model_path, backend, device, imgsz, threads)
@@ -2,11 +2,20 @@
 Interactive demo of the object detection system
 """
 
+import argparse
 import sys
-from ultralytics import YOLO
 import os
 
+from backends import BACKENDS
+from registry import get_model
+from utils import detection_labels, extract_detections
+
 def main():
+    parser = argparse.ArgumentParser(description='Object detection demo')
+    parser.add_argument('--backend', type=str, default='torch', choices=BACKENDS,
+                        help='Inference backend (default: torch)')
+    args = parser.parse_args()
+    
     print("=" * 60)
     print("OBJECT DETECTION ML PROJECT - DEMO")
     print("=" * 60)
@@ -30,7 +39,7 @@ def main():
     print()
     print("Loading YOLOv8 model...")
     try:
-        model = YOLO('yolov8n.pt')
+        model = get_model('yolov8n.pt', args.backend)
         print("✓ Model loaded successfully!")
         print()
     except Exception as e:
@@ -54,12 +63,7 @@ def main():
     print("Detection Results:")
     print("-" * 60)
     
-    detections = []
-    for box in results[0].boxes:
-        class_id = int(box.cls[0])
-        confidence = float(box.conf[0])
-        class_name = model.names[class_id]
-        detections.append((class_name, confidence))
+    detections = detection_labels(extract_detections(results[0]), model.names)
     
     if detections:
         for i, (class_name, confidence) in enumerate(detections, 1):
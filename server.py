@@ -0,0 +1,241 @@
+"""
+Long-lived detection server with dynamic request batching
+Keeps the model loaded and warm; concurrent requests are coalesced into micro-batches
+"""
+
+import argparse
+import json
+import os
+import queue
+import socket
+import socketserver
+import threading
+import time
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import cv2
+import numpy as np
+
+from backends import BACKENDS
+from registry import get_model
+from utils import extract_detections
+
+
+class MicroBatcher:
+    """
+    Collect concurrent inference requests into batches
+
+    The first queued request opens a batch; the batch is run as soon as it
+    holds max_batch images or max_wait_ms have passed, whichever is first.
+    """
+
+    def __init__(self, model, conf_threshold=0.25, imgsz=640, max_batch=16, max_wait_ms=5.0):
+        self.model = model
+        self.conf_threshold = conf_threshold
+        self.imgsz = imgsz
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self.batches = 0
+        self.images = 0
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, image) -> Future:
+        """Queue an image; the future resolves to its extracted detections"""
+        future = Future()
+        self._queue.put((image, future))
+        return future
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            try:
+                results = self.model([image for image, _ in batch], conf=self.conf_threshold,
+                                     imgsz=self.imgsz, verbose=False)
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            self.batches += 1
+            self.images += len(batch)
+            for (_, future), result in zip(batch, results):
+                future.set_result(extract_detections(result))
+
+
+def detections_to_json(detections, names):
+    """Convert extracted detections to JSON-serializable dictionaries"""
+    return [
+        {
+            'class': names[class_id],
+            'class_id': class_id,
+            'confidence': round(confidence, 4),
+            'box': [round(v, 1) for v in box],
+        }
+        for class_id, confidence, box in zip(detections['cls'].tolist(),
+                                             detections['conf'].tolist(),
+                                             detections['xyxy'].tolist())
+    ]
+
+
+class DetectionHandler(BaseHTTPRequestHandler):
+    """
+    POST /detect with encoded image bytes as the body -> JSON detections
+    GET /health -> server status
+    """
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path != '/health':
+            self._send_json(404, {'error': 'not found'})
+            return
+        batcher = self.server.batcher
+        self._send_json(200, {
+            'status': 'ok',
+            'batches': batcher.batches,
+            'images': batcher.images,
+            'avg_batch': batcher.images / batcher.batches if batcher.batches else 0.0,
+        })
+
+    def do_POST(self):
+        if self.path != '/detect':
+            self._send_json(404, {'error': 'not found'})
+            return
+
+        start = time.perf_counter()
+        length = int(self.headers.get('Content-Length', 0))
+        data = self.rfile.read(length)
+        image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+        if image is None:
+            self._send_json(400, {'error': 'body is not a decodable image'})
+            return
+
+        try:
+            detections = self.server.batcher.submit(image).result()
+        except Exception as e:
+            self._send_json(500, {'error': str(e)})
+            return
+
+        self._send_json(200, {
+            'detections': detections_to_json(detections, self.server.names),
+            'latency_ms': round((time.perf_counter() - start) * 1000, 2),
+        })
+
+    def log_message(self, format, *args):
+        pass
+
+
+class UnixHTTPServer(ThreadingHTTPServer):
+    """ThreadingHTTPServer listening on a Unix domain socket"""
+
+    address_family = socket.AF_UNIX
+
+    def server_bind(self):
+        socketserver.TCPServer.server_bind(self)
+        self.server_name = 'localhost'
+        self.server_port = 0
+
+    def get_request(self):
+        request, _ = super().get_request()
+        return request, ('local', 0)
+
+
+def create_server(model, host='127.0.0.1', port=8000, unix_socket=None, conf_threshold=0.25,
+                  imgsz=640, max_batch=16, max_wait_ms=5.0):
+    """
+    Build a detection server around a loaded model
+
+    Args:
+        model: YOLO model instance
+        host: Interface to listen on (TCP)
+        port: Port to listen on (TCP)
+        unix_socket: Listen on this Unix socket path instead of TCP
+        conf_threshold: Confidence threshold
+        imgsz: Inference image size
+        max_batch: Maximum images per forward pass
+        max_wait_ms: Longest a request waits for others to join its batch
+
+    Returns:
+        An HTTP server; call serve_forever() to run it
+    """
+    if unix_socket:
+        if os.path.exists(unix_socket):
+            os.unlink(unix_socket)
+        server = UnixHTTPServer(unix_socket, DetectionHandler)
+    else:
+        server = ThreadingHTTPServer((host, port), DetectionHandler)
+    server.daemon_threads = True
+    server.names = model.names
+    server.batcher = MicroBatcher(model, conf_threshold, imgsz, max_batch, max_wait_ms)
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Object detection server with dynamic batching')
+    parser.add_argument('--model', type=str, default='yolov8n.pt',
+                        help='Path to model file (default: yolov8n.pt)')
+    parser.add_argument('--backend', type=str, default=None, choices=BACKENDS,
+                        help='Inference backend (default: inferred from --model)')
+    parser.add_argument('--host', type=str, default='127.0.0.1',
+                        help='Host to listen on (default: 127.0.0.1)')
+    parser.add_argument('--port', type=int, default=8000,
+                        help='Port to listen on (default: 8000)')
+    parser.add_argument('--unix-socket', type=str, default=None,
+                        help='Listen on a Unix socket path instead of TCP')
+    parser.add_argument('--conf', type=float, default=0.25,
+                        help='Confidence threshold (default: 0.25)')
+    parser.add_argument('--imgsz', type=int, default=640,
+                        help='Inference image size (default: 640)')
+    parser.add_argument('--max-batch', type=int, default=16,
+                        help='Maximum images per forward pass (default: 16)')
+    parser.add_argument('--max-wait-ms', type=float, default=5.0,
+                        help='Maximum time a request waits for a batch to fill (default: 5)')
+
+    args = parser.parse_args()
+
+    print(f"Loading model: {args.model}")
+    model = get_model(args.model, args.backend, imgsz=args.imgsz)
+    # Warm up the full batch shape once so the first requests are not slow
+    model([np.zeros((args.imgsz, args.imgsz, 3), dtype=np.uint8)] * args.max_batch,
+          imgsz=args.imgsz, verbose=False)
+    print("Model loaded and warmed up!")
+
+    server = create_server(model, args.host, args.port, args.unix_socket, args.conf,
+                           args.imgsz, args.max_batch, args.max_wait_ms)
+    where = args.unix_socket or f"http://{args.host}:{args.port}"
+    print(f"Serving detections on {where} (POST /detect, GET /health). Press Ctrl+C to stop")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        batcher = server.batcher
+        if batcher.batches:
+            print(f"\nServed {batcher.images} images in {batcher.batches} batches "
+                  f"(avg batch {batcher.images / batcher.batches:.1f})")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,8 +5,12 @@ Quick test script to verify object detection is working
 import numpy as np
 from PIL import Image
 from pathlib import Path
-from ultralytics import YOLO
 import os
+import subprocess
+import sys
+
+from registry import get_model
+from utils import detection_labels, extract_detections
 
 def create_test_image():
     """Create a simple test image"""
@@ -39,7 +43,7 @@ def test_detection():
     # Load model (will download on first use)
     print("Loading YOLOv8 model (this may download on first use)...")
     try:
-        model = YOLO('yolov8n.pt')
+        model = get_model('yolov8n.pt')
         print("✓ Model loaded successfully!")
         print()
     except Exception as e:
@@ -66,12 +70,7 @@ def test_detection():
         # Print detected objects
         print("Detected Objects:")
         print("-" * 30)
-        detections = []
-        for box in results[0].boxes:
-            class_id = int(box.cls[0])
-            confidence = float(box.conf[0])
-            class_name = model.names[class_id]
-            detections.append((class_name, confidence))
+        detections = detection_labels(extract_detections(results[0]), model.names)
         
         if detections:
             for class_name, confidence in detections:
@@ -93,7 +92,267 @@ def test_detection():
         import traceback
         traceback.print_exc()
 
+class _Tensor:
+    def __init__(self, array):
+        self.array = array
+    
+    def cpu(self):
+        return self
+    
+    def numpy(self):
+        return self.array
+
+
+class _Boxes:
+    def __init__(self, data):
+        self.data = _Tensor(data)
+    
+    def __len__(self):
+        return len(self.data.array)
+
+
+class _Result:
+    """Minimal ultralytics result: boxes.data rows of [x1, y1, x2, y2, conf, cls]"""
+    
+    def __init__(self, data, names):
+        self.boxes = _Boxes(data)
+        self.names = names
+
+
+class FakeModel:
+    """Stands in for a YOLO model: one 'person' box in the top-left quarter of every image"""
+    
+    names = {0: 'person', 1: 'car'}
+    ckpt_path = __file__
+    
+    def __init__(self):
+        self.calls = 0
+    
+    def __call__(self, images, conf=0.25, imgsz=640, classes=None, verbose=True):
+        images = images if isinstance(images, list) else [images]
+        self.calls += len(images)
+        results = []
+        for image in images:
+            height, width = image.shape[:2]
+            data = np.array([[0, 0, width / 2, height / 2, 0.9, 0]], dtype=np.float32)
+            if classes is not None and 0 not in classes:
+                data = data[:0]
+            results.append(_Result(data, self.names))
+        return results
+
+
+def _write_images(directory, names):
+    directory.mkdir(parents=True, exist_ok=True)
+    for name in names:
+        Image.new('RGB', (64, 48), color='gray').save(directory / name)
+
+
+def test_manifest_resume_keeps_store(tmp_path):
+    """A resumed --manifest run appends to the detection store instead of replacing it"""
+    from detection_store import read_detections, read_frame_labels
+    from utils import batch_process
+    
+    images = tmp_path / 'images'
+    store = tmp_path / 'store'
+    manifest = tmp_path / 'manifest.db'
+    _write_images(images, ['a.jpg', 'b.jpg'])
+    batch_process(FakeModel(), images, tmp_path / 'out', batch_size=2, save=False,
+                  manifest_path=manifest, detections_out=store)
+    
+    # The second run only infers the new image but keeps the earlier boxes
+    _write_images(images, ['c.jpg'])
+    model = FakeModel()
+    summary = batch_process(model, images, tmp_path / 'out', batch_size=2, save=False,
+                            manifest_path=manifest, detections_out=store)
+    assert model.calls == 1
+    assert sorted(summary) == ['a.jpg', 'b.jpg', 'c.jpg']
+    
+    records = read_detections(store)
+    labels = read_frame_labels(store)
+    assert sorted(labels.values()) == ['a.jpg', 'b.jpg', 'c.jpg']
+    assert len(records) == 3
+    assert sorted(labels[frame] for frame in records['frame'].tolist()) == ['a.jpg', 'b.jpg', 'c.jpg']
+
+
+def test_threaded_write_errors_propagate(tmp_path):
+    """An on_done failure after a threaded write stops the run instead of being logged"""
+    from utils import _process_files
+
+    images = tmp_path / 'images'
+    _write_images(images, ['a.jpg', 'b.jpg'])
+
+    def on_done(image_file, counts):
+        raise RuntimeError('manifest write failed')
+
+    try:
+        _process_files(FakeModel(), sorted(images.iterdir()), tmp_path / 'out', 0.25,
+                       batch_size=2, imgsz=64, workers=2, prefetch=1, on_done=on_done)
+    except RuntimeError as error:
+        assert 'manifest write failed' in str(error)
+    else:
+        raise AssertionError('on_done error was swallowed')
+
+
+def test_cold_start():
+    """Check that importing the CLI modules does not pull in torch/ultralytics"""
+    repo = Path(__file__).resolve().parent
+    check = ("import sys, detect, utils; "
+             "print(','.join(m for m in ('torch', 'ultralytics') if m in sys.modules))")
+    loaded = subprocess.run([sys.executable, '-c', check], cwd=repo, capture_output=True,
+                            text=True, check=True).stdout.strip()
+    assert not loaded, f"importing detect/utils loaded {loaded}"
+
+
+def _detections(boxes, conf, cls):
+    return {
+        'xyxy': np.array(boxes, dtype=np.float32).reshape(-1, 4),
+        'conf': np.array(conf, dtype=np.float32),
+        'cls': np.array(cls, dtype=np.int64),
+    }
+
+
+def test_detection_cache(tmp_path):
+    """Cached detections round-trip, settings change the key, and the budget is kept"""
+    from cache import DetectionCache
+    
+    cache = DetectionCache(tmp_path / 'cache', __file__, 0.25, 640)
+    key = cache.key(b'image bytes')
+    assert cache.get(key) is None
+    cache.put(key, _detections([[1, 2, 3, 4]], [0.5], [2]))
+    cached = cache.get(key)
+    assert cached['xyxy'].tolist() == [[1, 2, 3, 4]] and cached['cls'].tolist() == [2]
+    assert (cache.hits, cache.misses) == (1, 1)
+    
+    # Overwriting an entry does not count its size twice
+    size = cache._size
+    cache.put(key, _detections([[1, 2, 3, 4]], [0.5], [2]))
+    assert cache._size == size
+    
+    other = DetectionCache(tmp_path / 'cache', __file__, 0.25, 640, variant='classes0')
+    assert other.key(b'image bytes') != key
+    
+    small = DetectionCache(tmp_path / 'small', __file__, 0.25, 640, max_bytes=size * 3)
+    for i in range(10):
+        small.put(small.key(bytes([i])), _detections([[1, 2, 3, 4]], [0.5], [2]))
+    stored = sum(f.stat().st_size for f in (tmp_path / 'small').glob('*/*.npy'))
+    assert stored <= size * 3
+
+
+def test_manifest_skips_unchanged_files(tmp_path):
+    """Recorded files are found again after reopening, until they change"""
+    from manifest import Manifest
+    
+    image = tmp_path / 'a.jpg'
+    image.write_bytes(b'1234')
+    manifest = Manifest(tmp_path / 'manifest.db')
+    assert manifest.lookup(image) is None
+    manifest.record(image, {'person': 2})
+    manifest.close()
+    
+    manifest = Manifest(tmp_path / 'manifest.db')
+    assert manifest.lookup(image) == {'person': 2}
+    image.write_bytes(b'123456')
+    assert manifest.lookup(image) is None
+    manifest.close()
+
+
+def test_detection_store_round_trip(tmp_path):
+    """Boxes written across several chunks read back with their frames, labels and tracks"""
+    from detection_store import (DetectionWriter, class_counts, frame_counts, read_detections,
+                                 read_frame_labels, read_meta)
+    
+    names = {0: 'person', 1: 'car'}
+    with DetectionWriter(tmp_path / 'store', names, source='test', chunk_rows=2) as store:
+        store.append(_detections([[0, 0, 10, 10], [5, 5, 20, 20]], [0.9, 0.8], [0, 1]),
+                     label='a.jpg')
+        store.append(_detections([], [], []), label='b.jpg')
+        tracked = _detections([[1, 1, 2, 2]], [0.7], [1])
+        tracked['track'] = np.array([7])
+        store.append(tracked, frame=5, label='c.jpg')
+    
+    records = read_detections(tmp_path / 'store')
+    assert len(list((tmp_path / 'store').glob('chunk_*.npy'))) == 2
+    assert records['frame'].tolist() == [0, 0, 5]
+    assert records['track'].tolist() == [-1, -1, 7]
+    assert records['x2'].tolist() == [10, 20, 2]
+    assert read_frame_labels(tmp_path / 'store') == {0: 'a.jpg', 1: 'b.jpg', 5: 'c.jpg'}
+    meta = read_meta(tmp_path / 'store')
+    assert meta['names'] == names and (meta['frames'], meta['rows']) == (3, 3)
+    assert class_counts(records, names) == {'person': 1, 'car': 2}
+    assert frame_counts(records).tolist() == [2, 0, 0, 0, 0, 1]
+
+
+def test_tracker_keeps_ids():
+    """A moving object keeps its track ID; keyframe tracking skips the model in between"""
+    from tracking import IouTracker, KeyframeTracker
+    
+    tracker = IouTracker()
+    for step in range(5):
+        x = 10 + 4 * step
+        tracks = tracker.update(np.array([[x, 10, x + 40, 50]], dtype=np.float32),
+                                np.array([0]), np.array([0.9]))
+        assert [track.id for track in tracks] == [1]
+    # Between keyframes the box keeps moving with the estimated velocity
+    predicted = tracker.predict()[0].box
+    assert predicted[0] > 26
+    
+    model = FakeModel()
+    keyframes = KeyframeTracker(model, keyframe_interval=3, scene_threshold=0, imgsz=64)
+    frame = np.zeros((48, 64, 3), dtype=np.uint8)
+    ids = {track.id for _ in range(6) for track in keyframes.process(frame)}
+    assert model.calls == 2 and ids == {1}
+
+
+def test_merge_detections_fuses_split_objects():
+    """Halves of one object cut by a tile border merge; other classes are kept"""
+    from tiling import merge_detections, tile_windows
+    
+    detections = _detections([[0, 0, 60, 50], [50, 0, 100, 50], [50, 0, 100, 50]],
+                             [0.9, 0.8, 0.7], [0, 0, 1])
+    merged = merge_detections(detections, iou_threshold=0.1)
+    assert sorted(merged['cls'].tolist()) == [0, 1]
+    assert merged['xyxy'][merged['cls'] == 0].tolist() == [[0, 0, 100, 50]]
+    
+    windows = tile_windows(1000, 700, tile_size=640, overlap=0.2)
+    assert windows[-1] == (360, 60, 1000, 700)
+    assert all(x2 - x1 == 640 and y2 - y1 == 640 for x1, y1, x2, y2 in windows)
+
+
+def test_motion_gate():
+    """Static frames are skipped, motion and max_skip trigger inference"""
+    from motion import MotionGate
+    
+    gate = MotionGate('diff', max_skip=3)
+    frame = np.full((120, 160, 3), 100, dtype=np.uint8)
+    assert gate.should_infer(frame)
+    gate.last_detections = _detections([], [], [])
+    assert [gate.should_infer(frame.copy()) for _ in range(4)] == [False, False, False, True]
+    
+    moved = frame.copy()
+    moved[20:80, 20:80] = 255
+    assert gate.should_infer(moved)
+    
+    # Motion outside the watched region is ignored
+    roi_gate = MotionGate('diff', roi=[(100, 0, 160, 120)])
+    roi_gate.should_infer(frame)
+    roi_gate.last_detections = _detections([], [], [])
+    assert not roi_gate.should_infer(moved)
+
+
+def test_run_inference_classes_and_roi():
+    """ROI crops are inferred and mapped back; classes reach the model's NMS"""
+    from utils import run_inference
+    
+    model = FakeModel()
+    image = np.zeros((100, 200, 3), dtype=np.uint8)
+    detections = run_inference(model, [image], 0.25, 64, roi=(100, 20, 200, 100))[0]
+    assert detections['xyxy'].tolist() == [[100, 20, 150, 60]]
+    assert len(run_inference(model, [image], 0.25, 64, classes=[1])[0]['cls']) == 0
+    assert len(run_inference(model, [image], 0.25, 64, roi=(500, 500, 600, 600))[0]['cls']) == 0
+
+
 if __name__ == "__main__":
     test_detection()
+    test_cold_start()
 
 
@@ -0,0 +1,178 @@
+"""
+Sliced (tiled) inference for high-resolution images
+
+Large images are cut into overlapping tiles that are run through the
+model at native resolution, so small objects survive; detections from
+all tiles are then merged with a vectorized cross-tile NMS / box fusion.
+"""
+
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import cv2
+import numpy as np
+
+from metrics import metrics
+from utils import extract_detections, iter_batches
+
+
+def tile_windows(width: int, height: int, tile_size: int = 640,
+                 overlap: float = 0.2) -> List[Tuple[int, int, int, int]]:
+    """
+    Overlapping tile windows covering an image
+
+    The last tile in each row/column is shifted back to end at the image
+    edge, so every tile is full size (unless the image is smaller).
+
+    Returns:
+        List of (x1, y1, x2, y2) windows, ordered row by row
+    """
+    step = max(int(tile_size * (1 - overlap)), 1)
+
+    def starts(length):
+        if length <= tile_size:
+            return [0]
+        positions = list(range(0, length - tile_size, step))
+        positions.append(length - tile_size)
+        return positions
+
+    return [(x, y, min(x + tile_size, width), min(y + tile_size, height))
+            for y in starts(height) for x in starts(width)]
+
+
+def open_large_image(source):
+    """
+    Open an image without making extra full-size copies
+
+    .npy arrays are memory-mapped, so only the tiles being processed are
+    read from disk; other formats are decoded once and tiles are taken as
+    views of that single array.
+    """
+    if isinstance(source, np.ndarray):
+        return source
+    path = Path(source)
+    if path.suffix.lower() == '.npy':
+        return np.load(path, mmap_mode='r')
+    with metrics.stage('decode'):
+        return cv2.imread(str(path))
+
+
+def merge_detections(detections: Dict[str, np.ndarray], iou_threshold: float = 0.5,
+                     metric: str = 'ios', fuse: bool = True) -> Dict[str, np.ndarray]:
+    """
+    Class-aware greedy NMS over detections gathered from many tiles
+
+    Objects cut by a tile border produce a partial box inside a fuller one;
+    their IoU is low but their intersection over the smaller box ('ios') is
+    high, which is why 'ios' is the default metric. With fuse=True, boxes a
+    kept box suppresses are folded into it (union of the boxes) instead of
+    being dropped, which reconstructs objects split across tiles.
+
+    Args:
+        detections: Detections in global image coordinates
+        iou_threshold: Overlap above which boxes are merged
+        metric: 'iou' or 'ios' (intersection over smaller area)
+        fuse: Merge suppressed boxes into the kept one
+
+    Returns:
+        Merged detections
+    """
+    boxes, scores, classes = detections['xyxy'], detections['conf'], detections['cls']
+    if len(boxes) == 0:
+        return detections
+
+    order = np.argsort(-scores)
+    boxes, scores, classes = boxes[order], scores[order], classes[order]
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    alive = np.ones(len(boxes), dtype=bool)
+    keep = []
+    merged = boxes.copy()
+
+    for i in range(len(boxes)):
+        if not alive[i]:
+            continue
+        keep.append(i)
+        rest = np.flatnonzero(alive[i + 1:]) + i + 1
+        rest = rest[classes[rest] == classes[i]]
+        if len(rest) == 0:
+            continue
+
+        inter_w = np.clip(np.minimum(boxes[i, 2], boxes[rest, 2]) -
+                          np.maximum(boxes[i, 0], boxes[rest, 0]), 0, None)
+        inter_h = np.clip(np.minimum(boxes[i, 3], boxes[rest, 3]) -
+                          np.maximum(boxes[i, 1], boxes[rest, 1]), 0, None)
+        inter = inter_w * inter_h
+        if metric == 'ios':
+            overlap = inter / np.maximum(np.minimum(areas[i], areas[rest]), 1e-9)
+        else:
+            overlap = inter / np.maximum(areas[i] + areas[rest] - inter, 1e-9)
+
+        suppressed = rest[overlap > iou_threshold]
+        alive[suppressed] = False
+        if fuse and len(suppressed):
+            group = boxes[np.append(suppressed, i)]
+            merged[i] = [group[:, 0].min(), group[:, 1].min(),
+                         group[:, 2].max(), group[:, 3].max()]
+
+    keep = np.array(keep, dtype=np.int64)
+    return {'xyxy': merged[keep], 'conf': scores[keep], 'cls': classes[keep]}
+
+
+def sliced_detect(model, source, tile_size: int = 640, overlap: float = 0.2,
+                  conf_threshold: float = 0.25, imgsz: int = None, batch_size: int = 8,
+                  iou_threshold: float = 0.5, full_pass: bool = True,
+                  classes: List[int] = None) -> Dict[str, np.ndarray]:
+    """
+    Detect objects in a large image tile by tile
+
+    Tiles are cut in row order, batch_size at a time, from the source
+    image, so peak memory is the image (or, for memory-mapped .npy input,
+    just the rows being read) plus one batch of tiles.
+
+    Args:
+        model: YOLO model instance
+        source: Image array, image path, or .npy path (memory-mapped)
+        tile_size: Tile side length in pixels
+        overlap: Fraction of overlap between neighbouring tiles
+        conf_threshold: Confidence threshold
+        imgsz: Inference size per tile (default: tile_size)
+        batch_size: Tiles per forward pass
+        iou_threshold: Overlap threshold for cross-tile merging
+        full_pass: Also run on the whole downscaled image to catch large objects
+        classes: Class ids to detect, filtered in the model's NMS (None = all)
+
+    Returns:
+        Merged detections in full-image coordinates
+    """
+    image = open_large_image(source)
+    if image is None:
+        raise ValueError(f"Could not read image: {source}")
+    height, width = image.shape[:2]
+    imgsz = imgsz or tile_size
+
+    windows = tile_windows(width, height, tile_size, overlap)
+    parts = []
+    for window_batch in iter_batches(windows, batch_size):
+        tiles = [np.ascontiguousarray(image[y1:y2, x1:x2]) for x1, y1, x2, y2 in window_batch]
+        with metrics.stage('model'):
+            results = model(tiles, conf=conf_threshold, imgsz=imgsz, classes=classes,
+                            verbose=False)
+        for (x1, y1, _, _), result in zip(window_batch, results):
+            metrics.observe_result(result)
+            detections = extract_detections(result)
+            detections['xyxy'] = detections['xyxy'] + np.array([x1, y1, x1, y1], dtype=np.float32)
+            parts.append(detections)
+
+    if full_pass and len(windows) > 1:
+        # Subsample rows/columns first so a memory-mapped image is not read in full
+        step = max(1, max(height, width) // (imgsz * 2))
+        with metrics.stage('model'):
+            result = model(np.ascontiguousarray(image[::step, ::step]), conf=conf_threshold,
+                           imgsz=imgsz, classes=classes, verbose=False)[0]
+        detections = extract_detections(result)
+        detections['xyxy'] = detections['xyxy'] * step
+        parts.append(detections)
+
+    combined = {key: np.concatenate([part[key] for part in parts]) for key in parts[0]}
+    with metrics.stage('merge'):
+        return merge_detections(combined, iou_threshold)
@@ -0,0 +1,222 @@
+"""
+Lightweight object tracking between detector keyframes
+
+The detector runs only on keyframes (every n frames, or when the scene
+changes); in between, boxes are propagated with a constant-velocity model
+and keep stable track IDs across keyframes via IoU association.
+"""
+
+import itertools
+from typing import Dict, List
+
+import cv2
+import numpy as np
+
+from metrics import metrics
+from utils import box_iou, draw_detections, run_inference
+
+
+class Track:
+    """A single tracked object with a constant-velocity motion model"""
+
+    def __init__(self, track_id: int, box, class_id: int, confidence: float):
+        self.id = track_id
+        self.box = np.asarray(box, dtype=np.float32)
+        self.velocity = np.zeros(4, dtype=np.float32)
+        self.class_id = class_id
+        self.confidence = confidence
+        self.frames_since_seen = 0
+        self.misses = 0
+
+    def predict(self):
+        """Advance the box by one frame of motion"""
+        self.box = self.box + self.velocity
+        self.frames_since_seen += 1
+
+    def correct(self, box, confidence: float, smoothing: float):
+        """Snap to a matched detection and update the velocity estimate"""
+        box = np.asarray(box, dtype=np.float32)
+        # The predicted box already moved by velocity * frames_since_seen;
+        # the residual tells how far off the estimate was per frame
+        frames = max(self.frames_since_seen, 1)
+        measured = self.velocity + (box - self.box) / frames
+        self.velocity = smoothing * measured + (1 - smoothing) * self.velocity
+        self.box = box
+        self.confidence = confidence
+        self.frames_since_seen = 0
+        self.misses = 0
+
+
+class IouTracker:
+    """
+    Associate detections with existing tracks by greedy per-class IoU matching
+    """
+
+    def __init__(self, iou_threshold: float = 0.3, max_misses: int = 2,
+                 smoothing: float = 0.5):
+        """
+        Args:
+            iou_threshold: Minimum IoU for a detection to continue a track
+            max_misses: Keyframes a track may go unmatched before it is dropped
+            smoothing: Weight of the newest velocity measurement (0-1)
+        """
+        self.iou_threshold = iou_threshold
+        self.max_misses = max_misses
+        self.smoothing = smoothing
+        self.tracks: List[Track] = []
+        self._ids = itertools.count(1)
+
+    def predict(self) -> List[Track]:
+        """Propagate all tracks one frame without a detector result"""
+        for track in self.tracks:
+            track.predict()
+        return self.active_tracks()
+
+    def update(self, boxes: np.ndarray, class_ids: np.ndarray,
+               confidences: np.ndarray) -> List[Track]:
+        """
+        Propagate tracks one frame, then match them to fresh detections
+
+        Args:
+            boxes: Detected boxes, shape (N, 4) as [x1, y1, x2, y2]
+            class_ids: Class id per detection, shape (N,)
+            confidences: Confidence per detection, shape (N,)
+
+        Returns:
+            Tracks matched or created on this frame
+        """
+        for track in self.tracks:
+            track.predict()
+
+        matched_tracks = set()
+        matched_dets = set()
+        if self.tracks and len(boxes):
+            track_boxes = np.stack([track.box for track in self.tracks])
+            track_classes = np.array([track.class_id for track in self.tracks])
+            iou = box_iou(track_boxes, boxes)
+            iou[track_classes[:, None] != class_ids[None, :]] = 0.0
+
+            for flat in np.argsort(-iou, axis=None):
+                t, d = np.unravel_index(flat, iou.shape)
+                if iou[t, d] < self.iou_threshold:
+                    break
+                if t in matched_tracks or d in matched_dets:
+                    continue
+                self.tracks[t].correct(boxes[d], float(confidences[d]), self.smoothing)
+                matched_tracks.add(t)
+                matched_dets.add(d)
+
+        for t, track in enumerate(self.tracks):
+            if t not in matched_tracks:
+                track.misses += 1
+        self.tracks = [track for track in self.tracks if track.misses <= self.max_misses]
+
+        for d in range(len(boxes)):
+            if d not in matched_dets:
+                self.tracks.append(Track(next(self._ids), boxes[d],
+                                         int(class_ids[d]), float(confidences[d])))
+
+        return self.active_tracks()
+
+    def active_tracks(self) -> List[Track]:
+        """Tracks that were matched on the most recent keyframe"""
+        return [track for track in self.tracks if track.misses == 0]
+
+
+def frame_signature(frame, size: int = 32) -> np.ndarray:
+    """Tiny grayscale thumbnail used for cheap scene-change checks"""
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    return cv2.resize(gray, (size, size), interpolation=cv2.INTER_AREA).astype(np.float32)
+
+
+class KeyframeTracker:
+    """
+    Run the detector on keyframes only and track objects in between
+
+    A frame is a keyframe every keyframe_interval frames, or earlier if it
+    differs from the last keyframe by more than scene_threshold (mean
+    absolute difference of downscaled grayscale frames, 0-1). Keyframes
+    are inferred with the given classes and roi as in run_inference.
+    """
+
+    def __init__(self, model, conf_threshold: float = 0.25, keyframe_interval: int = 5,
+                 scene_threshold: float = 0.15, tracker: IouTracker = None,
+                 imgsz: int = 640, classes: List[int] = None, roi=None):
+        self.model = model
+        self.imgsz = imgsz
+        self.classes = classes
+        self.roi = roi
+        self.conf_threshold = conf_threshold
+        self.keyframe_interval = max(int(keyframe_interval), 1)
+        self.scene_threshold = scene_threshold
+        self.tracker = tracker or IouTracker()
+        self.frames = 0
+        self.keyframes = 0
+        self._since_keyframe = 0
+        self._reference = None
+
+    def _is_keyframe(self, frame) -> bool:
+        if self._reference is None or self._since_keyframe >= self.keyframe_interval:
+            return True
+        if self.scene_threshold:
+            diff = np.abs(frame_signature(frame) - self._reference).mean() / 255.0
+            return diff > self.scene_threshold
+        return False
+
+    def process(self, frame) -> List[Track]:
+        """
+        Advance the tracker by one frame
+
+        Returns:
+            Tracks visible in this frame
+        """
+        self.frames += 1
+        if not self._is_keyframe(frame):
+            self._since_keyframe += 1
+            with metrics.stage('track'):
+                return self.tracker.predict()
+
+        self.keyframes += 1
+        self._since_keyframe = 1
+        self._reference = frame_signature(frame)
+        detections = run_inference(self.model, [frame], self.conf_threshold, self.imgsz,
+                                   self.classes, self.roi)[0]
+        with metrics.stage('track'):
+            return self.tracker.update(detections['xyxy'], detections['cls'], detections['conf'])
+
+    def stats(self) -> str:
+        """Human-readable summary of inference calls saved"""
+        if not self.frames:
+            return "No frames tracked"
+        rate = self.keyframes / self.frames
+        return (f"Detector ran on {self.keyframes}/{self.frames} frames "
+                f"({rate:.1%}); {1 - rate:.1%} of inference calls saved")
+
+
+def count_tracks(tracks: List[Track], names: Dict[int, str]) -> Dict[str, int]:
+    """Count tracked objects by class name"""
+    counts = {}
+    for track in tracks:
+        class_name = names[track.class_id]
+        counts[class_name] = counts.get(class_name, 0) + 1
+    return counts
+
+
+def tracks_to_detections(tracks: List[Track]) -> Dict[str, np.ndarray]:
+    """Convert tracks to a detections dict with an extra 'track' ID array"""
+    return {
+        'xyxy': np.array([track.box for track in tracks], dtype=np.float32).reshape(-1, 4),
+        'conf': np.array([track.confidence for track in tracks], dtype=np.float32),
+        'cls': np.array([track.class_id for track in tracks], dtype=np.int64),
+        'track': np.array([track.id for track in tracks], dtype=np.int32),
+    }
+
+
+def draw_tracks(frame, tracks: List[Track], names: Dict[int, str]):
+    """Draw tracked boxes labelled with class name and track ID, in place"""
+    return draw_detections(frame,
+                           [track.box for track in tracks],
+                           [f"{names[track.class_id]} #{track.id}" for track in tracks],
+                           [track.confidence for track in tracks],
+                           class_ids=[track.class_id for track in tracks],
+                           in_place=True)
@@ -7,9 +7,16 @@ import argparse
 from ultralytics import YOLO
 from pathlib import Path
 
+from autotune import apply_threads, tuned_settings
+from dataset import load_dataset_config
+from dataset_index import index_dataset, print_report, write_training_caches
+from image_cache import cached_trainer
+from quantize import quantize_model
 
-def train_model(model_size='n', data_config=None, epochs=100, imgsz=640, batch=16, 
-                device='cpu', project='runs/detect', name='custom_model'):
+
+def train_model(model_size='n', data_config=None, epochs=100, imgsz=640, batch=None, 
+                device='cpu', project='runs/detect', name='custom_model', quantize=None,
+                image_cache=None, index=False):
     """
     Train a YOLOv8 model on custom dataset
     
@@ -18,10 +25,13 @@ def train_model(model_size='n', data_config=None, epochs=100, imgsz=640, batch=1
         data_config: Path to dataset YAML config file
         epochs: Number of training epochs
         imgsz: Image size for training
-        batch: Batch size
+        batch: Batch size (None = from the autotune profile, else 16)
         device: Device to use ('cpu', 'cuda', or device number)
         project: Project directory
         name: Experiment name
+        quantize: Also produce an INT8 model of the best weights ('onnx' or 'openvino')
+        image_cache: Directory of the preprocessed image cache (None = decode every epoch)
+        index: Validate the dataset with dataset_index first and hand its labels to the trainer
     """
     
     # Load model
@@ -39,6 +49,23 @@ def train_model(model_size='n', data_config=None, epochs=100, imgsz=640, batch=1
         print(f"Error: Dataset config file not found: {data_config}")
         return
     
+    if index:
+        names = load_dataset_config(data_config).get('names') or {}
+        if isinstance(names, list):
+            names = dict(enumerate(names))
+        indexes = index_dataset(data_config)
+        print_report(indexes, names)
+        write_training_caches(indexes, names)
+        print()
+    
+    tuned = tuned_settings('training', imgsz)
+    if tuned:
+        apply_threads(tuned)
+        print(f"Using autotune profile: {tuned['threads']}/{tuned['interop_threads']} threads"
+              + (f", batch {tuned['batch']}" if batch is None else ""))
+    if batch is None:
+        batch = tuned['batch'] if tuned else 16
+    
     print(f"Training on dataset: {data_config}")
     print(f"Epochs: {epochs}, Image size: {imgsz}, Batch size: {batch}")
     print(f"Device: {device}\n")
@@ -53,13 +80,18 @@ def train_model(model_size='n', data_config=None, epochs=100, imgsz=640, batch=1
         project=project,
         name=name,
         save=True,
-        plots=True
+        plots=True,
+        trainer=cached_trainer(image_cache) if image_cache else None
     )
     
     print("\nTraining completed!")
     print(f"Best model saved to: {model.trainer.best}")
     print(f"Results saved to: {Path(project) / name}")
     
+    if quantize:
+        print()
+        quantize_model(model.trainer.best, data_config, quantize, imgsz)
+    
     return results
 
 
@@ -74,14 +106,20 @@ def main():
                         help='Number of training epochs (default: 100)')
     parser.add_argument('--imgsz', type=int, default=640,
                         help='Image size for training (default: 640)')
-    parser.add_argument('--batch', type=int, default=16,
-                        help='Batch size (default: 16)')
+    parser.add_argument('--batch', type=int, default=None,
+                        help='Batch size (default: from the autotune profile, else 16)')
     parser.add_argument('--device', type=str, default='cpu',
                         help='Device to use: cpu, cuda, or device number (default: cpu)')
     parser.add_argument('--project', type=str, default='runs/detect',
                         help='Project directory (default: runs/detect)')
     parser.add_argument('--name', type=str, default='custom_model',
                         help='Experiment name (default: custom_model)')
+    parser.add_argument('--quantize', type=str, default=None, choices=['onnx', 'openvino'],
+                        help='After training, also export an INT8 model calibrated on the val split')
+    parser.add_argument('--image-cache', type=str, default=None,
+                        help='Cache resized images in this directory so epochs skip JPEG decoding')
+    parser.add_argument('--index', action='store_true',
+                        help='Check the dataset and report statistics first; training reuses the scan')
     
     args = parser.parse_args()
     
@@ -93,7 +131,10 @@ def main():
         batch=args.batch,
         device=args.device,
         project=args.project,
-        name=args.name
+        name=args.name,
+        quantize=args.quantize,
+        image_cache=args.image_cache,
+        index=args.index
     )
 
 
@@ -2,84 +2,464 @@
 Utility functions for object detection project
 """
 
+import colorsys
 import cv2
+import json
+import multiprocessing
+import os
 import numpy as np
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from pathlib import Path
 from typing import List, Tuple, Dict
-from ultralytics import YOLO
+
+from autotune import tuned_settings
+from cache import DetectionCache
+from dataset import IMAGE_EXTENSIONS
+from detection_store import DetectionWriter
+from manifest import Manifest
+from metrics import metrics
 
 
 def get_model_info(model_path: str) -> Dict:
-    """Get information about a YOLO model"""
-    model = YOLO(model_path)
-    return {
+    """
+    Get information about a YOLO model
+    
+    The info is cached in a <weights>.meta.json sidecar, so only the first
+    call (or the first after the weights change) has to load the model.
+    """
+    path = Path(model_path)
+    sidecar = path.with_name(path.name + '.meta.json')
+    # Names ultralytics resolves or downloads (e.g. yolov8n.pt) have no local file yet
+    stat = path.stat() if path.is_file() else None
+    if stat is not None:
+        try:
+            cached = json.loads(sidecar.read_text())
+            if (cached['mtime_ns'], cached['size']) == (stat.st_mtime_ns, stat.st_size):
+                info = cached['info']
+                info['classes'] = {int(k): v for k, v in info['classes'].items()}
+                return info
+        except (OSError, ValueError, KeyError):
+            pass
+    
+    from registry import get_model
+    model = get_model(model_path)
+    args = getattr(model.model, 'args', None)
+    info = {
         'classes': model.names,
         'num_classes': len(model.names),
-        'input_size': model.model.args.get('imgsz', 640)
+        'input_size': args.get('imgsz', 640) if isinstance(args, dict) else 640
     }
+    if stat is None:
+        return info
+    try:
+        tmp_path = sidecar.with_name(sidecar.name + '.tmp')
+        tmp_path.write_text(json.dumps({'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size,
+                                        'info': info}))
+        os.replace(tmp_path, sidecar)
+    except OSError:
+        # Read-only weights directory: the info is simply not cached
+        pass
+    return info
 
 
-def count_objects(results, class_filter=None) -> Dict[str, int]:
+def letterbox(image, imgsz: int = 640, color=(114, 114, 114)) -> Tuple[np.ndarray, float, Tuple[int, int]]:
     """
-    Count detected objects by class
+    Resize an image to fit imgsz x imgsz, padding the rest
     
     Args:
-        results: YOLO detection results
+        image: Input image (numpy array)
+        imgsz: Side length of the square output
+        color: Padding color (B, G, R)
+    
+    Returns:
+        Tuple (padded image, scale factor, (pad_left, pad_top))
+    """
+    height, width = image.shape[:2]
+    scale = min(imgsz / height, imgsz / width)
+    new_w, new_h = round(width * scale), round(height * scale)
+    if (new_w, new_h) != (width, height):
+        image = cv2.resize(image, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+    
+    left = (imgsz - new_w) // 2
+    top = (imgsz - new_h) // 2
+    padded = np.empty((imgsz, imgsz, 3), dtype=image.dtype)
+    padded[:] = color
+    padded[top:top + new_h, left:left + new_w] = image
+    return padded, scale, (left, top)
+
+
+def empty_detections() -> Dict[str, np.ndarray]:
+    """Detections dict with no boxes"""
+    return {
+        'xyxy': np.zeros((0, 4), dtype=np.float32),
+        'conf': np.zeros(0, dtype=np.float32),
+        'cls': np.zeros(0, dtype=np.int64),
+    }
+
+
+def extract_detections(result) -> Dict[str, np.ndarray]:
+    """
+    Pull the detections of one YOLO result out as NumPy arrays
+    
+    All boxes are copied to the host in a single transfer instead of one
+    tensor view and sync per box.
+    
+    Args:
+        result: A single YOLO result
+    
+    Returns:
+        Dictionary with 'xyxy' (N, 4) float boxes, 'conf' (N,) scores
+        and 'cls' (N,) integer class ids
+    """
+    boxes = result.boxes
+    if boxes is None or len(boxes) == 0:
+        return empty_detections()
+    
+    # Rows are [x1, y1, x2, y2, (track_id,) conf, cls]
+    data = boxes.data.cpu().numpy()
+    return {
+        'xyxy': data[:, :4],
+        'conf': data[:, -2],
+        'cls': data[:, -1].astype(np.int64),
+    }
+
+
+def resolve_classes(classes, names) -> List[int]:
+    """
+    Turn class names and/or ids into sorted class ids
+    
+    Args:
+        classes: Iterable of class names (case-insensitive) or ids (ints or
+            digit strings); None or empty means all classes
+        names: Mapping of class ids to class names
+    
+    Returns:
+        List of class ids, or None for all classes
+    """
+    if not classes:
+        return None
+    by_name = {name.lower(): class_id for class_id, name in names.items()}
+    class_ids = set()
+    for item in classes:
+        if isinstance(item, (int, np.integer)) or str(item).isdigit():
+            class_id = int(item)
+            if class_id not in names:
+                raise ValueError(f"Unknown class id {class_id}; the model has {len(names)} classes")
+        else:
+            class_id = by_name.get(str(item).lower())
+            if class_id is None:
+                raise ValueError(f"Unknown class '{item}'; available: {', '.join(names.values())}")
+        class_ids.add(class_id)
+    return sorted(class_ids)
+
+
+def parse_box(spec) -> Tuple[int, int, int, int]:
+    """
+    Parse and check an x1,y1,x2,y2 pixel rectangle
+    
+    Args:
+        spec: "x1,y1,x2,y2" string or a sequence of four numbers
+    
+    Raises:
+        ValueError: If the rectangle is malformed, empty, or lies entirely
+            left of or above the image
+    """
+    values = spec.split(',') if isinstance(spec, str) else spec
+    try:
+        x1, y1, x2, y2 = (int(float(v)) for v in values)
+    except (TypeError, ValueError):
+        raise ValueError(f"Expected x1,y1,x2,y2, got '{spec}'")
+    if x2 <= x1 or y2 <= y1:
+        raise ValueError(f"Empty rectangle: '{spec}'")
+    if x2 <= 0 or y2 <= 0:
+        raise ValueError(f"Rectangle '{spec}' lies outside the image")
+    return x1, y1, x2, y2
+
+
+def check_roi(roi, width: int, height: int, name: str) -> bool:
+    """
+    Warn when roi misses a width x height image entirely
+    
+    Returns:
+        True if the ROI (or no ROI) leaves something to infer
+    """
+    if roi is None or (roi[0] < width and roi[1] < height and roi[2] > 0 and roi[3] > 0):
+        return True
+    print(f"Warning: ROI {tuple(roi)} lies outside {name} ({width}x{height}), "
+          f"nothing is detected in it")
+    return False
+
+
+def crop_roi(image, roi) -> Tuple[np.ndarray, Tuple[int, int]]:
+    """
+    Cut the region of interest out of an image
+    
+    Args:
+        image: Input image (numpy array)
+        roi: (x1, y1, x2, y2) in pixels, clamped to the image, or None
+    
+    Returns:
+        Tuple (crop, (x_offset, y_offset)); the crop is a view and may be
+        empty if the ROI lies outside the image
+    """
+    if roi is None:
+        return image, (0, 0)
+    height, width = image.shape[:2]
+    x1, y1 = min(max(roi[0], 0), width), min(max(roi[1], 0), height)
+    x2, y2 = min(max(roi[2], x1), width), min(max(roi[3], y1), height)
+    return image[y1:y2, x1:x2], (x1, y1)
+
+
+def offset_detections(detections: Dict[str, np.ndarray], offset: Tuple[int, int]) -> Dict[str, np.ndarray]:
+    """Shift detections from crop coordinates back to full-image coordinates"""
+    if offset == (0, 0):
+        return detections
+    x, y = offset
+    shifted = dict(detections)
+    shifted['xyxy'] = detections['xyxy'] + np.array([x, y, x, y], dtype=np.float32)
+    return shifted
+
+
+def run_inference(model, images, conf_threshold: float, imgsz: int,
+                  classes: List[int] = None, roi=None) -> List[Dict[str, np.ndarray]]:
+    """
+    Run one forward pass over a list of images and extract their detections
+    
+    Work is pruned before and inside the model rather than after it: with
+    roi set, only that part of each image is letterboxed and inferred, and
+    classes is handed to the model's NMS so other classes never become
+    boxes. Returned boxes are in full-image coordinates.
+    
+    Args:
+        model: YOLO model instance
+        images: List of images (numpy arrays)
+        conf_threshold: Confidence threshold
+        imgsz: Inference image size
+        classes: Class ids to detect (None = all)
+        roi: (x1, y1, x2, y2) region to run on (None = whole image)
+    
+    Returns:
+        One detections dict per image, in the format of extract_detections
+    """
+    crops = [crop_roi(image, roi) for image in images]
+    # An ROI entirely outside an image leaves nothing to infer
+    inputs = [crop for crop, _ in crops if crop.size]
+    results = iter(())
+    if inputs:
+        with metrics.stage('model'):
+            results = iter(model(inputs, conf=conf_threshold, imgsz=imgsz, classes=classes,
+                                 verbose=False))
+    
+    detections = []
+    for crop, offset in crops:
+        if not crop.size:
+            detections.append(empty_detections())
+            continue
+        result = next(results)
+        metrics.observe_result(result)
+        detections.append(offset_detections(extract_detections(result), offset))
+    return detections
+
+
+def filter_variant(classes: List[int] = None, roi=None) -> str:
+    """Cache variant for class/ROI-restricted inference ('' when unrestricted)"""
+    parts = []
+    if classes is not None:
+        parts.append(f"classes{','.join(map(str, classes))}")
+    if roi is not None:
+        parts.append(f"roi{','.join(map(str, roi))}")
+    return ':'.join(parts)
+
+
+def box_iou(boxes_a: np.ndarray, boxes_b: np.ndarray) -> np.ndarray:
+    """
+    Pairwise IoU between two sets of [x1, y1, x2, y2] boxes
+    
+    Returns:
+        Array of shape (len(boxes_a), len(boxes_b))
+    """
+    boxes_a = boxes_a[:, None, :]
+    boxes_b = boxes_b[None, :, :]
+    inter_w = np.clip(np.minimum(boxes_a[..., 2], boxes_b[..., 2]) -
+                      np.maximum(boxes_a[..., 0], boxes_b[..., 0]), 0, None)
+    inter_h = np.clip(np.minimum(boxes_a[..., 3], boxes_b[..., 3]) -
+                      np.maximum(boxes_a[..., 1], boxes_b[..., 1]), 0, None)
+    inter = inter_w * inter_h
+    area_a = (boxes_a[..., 2] - boxes_a[..., 0]) * (boxes_a[..., 3] - boxes_a[..., 1])
+    area_b = (boxes_b[..., 2] - boxes_b[..., 0]) * (boxes_b[..., 3] - boxes_b[..., 1])
+    return inter / np.maximum(area_a + area_b - inter, 1e-9)
+
+
+def filter_detections(detections: Dict[str, np.ndarray], min_conf: float = None,
+                      class_ids=None) -> Dict[str, np.ndarray]:
+    """
+    Select detections by confidence and/or class with a single boolean mask
+    
+    Args:
+        detections: Output of extract_detections
+        min_conf: Minimum confidence to keep
+        class_ids: Iterable of class ids to keep
+    
+    Returns:
+        Filtered detections in the same format
+    """
+    mask = np.ones(len(detections['cls']), dtype=bool)
+    if min_conf is not None:
+        mask &= detections['conf'] >= min_conf
+    if class_ids is not None:
+        mask &= np.isin(detections['cls'], list(class_ids))
+    return {key: value[mask] for key, value in detections.items()}
+
+
+def detection_labels(detections: Dict[str, np.ndarray], names) -> List[Tuple[str, float]]:
+    """Return (class_name, confidence) pairs for extracted detections"""
+    return [(names[class_id], confidence)
+            for class_id, confidence in zip(detections['cls'].tolist(),
+                                            detections['conf'].tolist())]
+
+
+def count_detections(detections: Dict[str, np.ndarray], names,
+                     class_filter=None) -> Dict[str, int]:
+    """
+    Count extracted detections by class name
+    
+    Args:
+        detections: Output of extract_detections
+        names: Mapping of class ids to class names
         class_filter: Optional list of class names to filter
     
     Returns:
         Dictionary with class names as keys and counts as values
     """
     counts = {}
+    if len(detections['cls']) == 0:
+        return counts
     
-    for result in results:
-        for box in result.boxes:
-            class_id = int(box.cls[0])
-            class_name = result.names[class_id]
-            
-            if class_filter is None or class_name in class_filter:
-                counts[class_name] = counts.get(class_name, 0) + 1
-    
+    bins = np.bincount(detections['cls'])
+    for class_id in np.flatnonzero(bins).tolist():
+        class_name = names[class_id]
+        if class_filter is None or class_name in class_filter:
+            counts[class_name] = int(bins[class_id])
     return counts
 
 
+def count_objects(results, class_filter=None) -> Dict[str, int]:
+    """
+    Count detected objects by class
+    
+    Args:
+        results: YOLO detection results
+        class_filter: Optional list of class names to filter
+    
+    Returns:
+        Dictionary with class names as keys and counts as values
+    """
+    return merge_counts(count_detections(extract_detections(result), result.names, class_filter)
+                        for result in results)
+
+
+def class_color(class_id: int) -> Tuple[int, int, int]:
+    """Stable, well-separated (B, G, R) color for a class id"""
+    return _CLASS_COLORS[class_id % len(_CLASS_COLORS)]
+
+
+def _build_palette(size: int = 64) -> List[Tuple[int, int, int]]:
+    palette = []
+    for i in range(size):
+        # Golden-ratio hue stepping keeps neighbouring ids visually distinct
+        r, g, b = colorsys.hsv_to_rgb((i * 0.618033988749895) % 1.0, 0.85, 0.95)
+        palette.append((int(b * 255), int(g * 255), int(r * 255)))
+    return palette
+
+
+_CLASS_COLORS = _build_palette()
+
+
+@lru_cache(maxsize=4096)
+def _label_patch(label: str, color: Tuple[int, int, int]) -> np.ndarray:
+    """Render a filled label box once; later draws just copy the pixels"""
+    (text_w, text_h), _ = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, 0.5, 1)
+    patch = np.empty((text_h + 10, text_w, 3), dtype=np.uint8)
+    patch[:] = color
+    cv2.putText(patch, label, (0, text_h + 5),
+                cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
+    return patch
+
+
 def draw_detections(image, boxes, class_names, confidences, 
-                   color=(0, 255, 0), thickness=2):
+                   color=(0, 255, 0), thickness=2, class_ids=None, in_place=False):
     """
     Draw bounding boxes on image
     
+    Label boxes are rendered once per (label, color) and cached, and labels
+    use two-decimal confidences, so busy frames mostly just copy cached
+    pixels instead of laying out text per box.
+    
     Args:
         image: Input image (numpy array)
         boxes: List of bounding boxes [x1, y1, x2, y2]
         class_names: List of class names
         confidences: List of confidence scores
-        color: Bounding box color (B, G, R)
+        color: Bounding box color (B, G, R), used when class_ids is None
         thickness: Line thickness
+        class_ids: Optional list of class ids for per-class colors
+        in_place: Draw directly on image instead of a copy
     
     Returns:
         Annotated image
     """
-    annotated = image.copy()
+    annotated = image if in_place else image.copy()
+    height, width = annotated.shape[:2]
+    
+    if class_ids is None:
+        class_ids = [None] * len(class_names)
     
-    for box, class_name, conf in zip(boxes, class_names, confidences):
+    for box, class_name, conf, class_id in zip(boxes, class_names, confidences, class_ids):
         x1, y1, x2, y2 = map(int, box)
+        box_color = color if class_id is None else class_color(int(class_id))
         
         # Draw rectangle
-        cv2.rectangle(annotated, (x1, y1), (x2, y2), color, thickness)
+        cv2.rectangle(annotated, (x1, y1), (x2, y2), box_color, thickness)
         
         # Draw label
-        label = f"{class_name}: {conf:.2f}"
-        label_size, _ = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, 0.5, 1)
-        label_y = max(y1, label_size[1] + 10)
-        
-        cv2.rectangle(annotated, (x1, label_y - label_size[1] - 10),
-                     (x1 + label_size[0], label_y), color, -1)
-        cv2.putText(annotated, label, (x1, label_y - 5),
-                   cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
+        patch = _label_patch(f"{class_name}: {conf:.2f}", box_color)
+        patch_h, patch_w = patch.shape[:2]
+        label_y = max(y1, patch_h)
+        top, left = label_y - patch_h, max(x1, 0)
+        bottom, right = min(label_y, height), min(left + patch_w, width)
+        if bottom > top and right > left:
+            annotated[top:bottom, left:right] = patch[:bottom - top, :right - left]
     
     return annotated
 
 
+def plot_result(result, image=None, in_place=True):
+    """
+    Draw a YOLO result with draw_detections
+    
+    Drop-in replacement for result.plot() that can draw directly on the
+    source frame.
+    
+    Args:
+        result: A single YOLO result
+        image: Frame to draw on (defaults to result.orig_img)
+        in_place: Draw directly on the frame instead of a copy
+    
+    Returns:
+        Annotated image
+    """
+    if image is None:
+        image = result.orig_img
+    detections = extract_detections(result)
+    class_ids = detections['cls'].tolist()
+    return draw_detections(image, detections['xyxy'],
+                           [result.names[class_id] for class_id in class_ids],
+                           detections['conf'].tolist(),
+                           class_ids=class_ids, in_place=in_place)
+
+
 def save_detection_summary(results, output_path: str):
     """
     Save detection summary to text file
@@ -105,31 +485,459 @@ def save_detection_summary(results, output_path: str):
     print(f"Summary saved to: {output_path}")
 
 
-def batch_process(model, image_dir: str, output_dir: str, conf_threshold: float = 0.25):
+def iter_batches(items, batch_size: int):
+    """
+    Group an iterable into lists of at most batch_size items
+
+    Args:
+        items: Any iterable
+        batch_size: Maximum number of items per batch
+
+    Yields:
+        Lists of consecutive items
+    """
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def scan_images(image_dir, recursive: bool = False):
+    """
+    Lazily yield image files under a directory
+    
+    Entries are yielded as os.scandir finds them, so processing can start
+    before a huge directory has been fully enumerated.
+    
+    Args:
+        image_dir: Directory to scan
+        recursive: Descend into subdirectories
+    
+    Yields:
+        Paths of image files
+    """
+    stack = [str(image_dir)]
+    while stack:
+        with os.scandir(stack.pop()) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    if recursive:
+                        stack.append(entry.path)
+                elif os.path.splitext(entry.name)[1].lower() in IMAGE_EXTENSIONS:
+                    yield Path(entry.path)
+
+
+def bounded_map(func, items, workers: int = 0, prefetch: int = 4):
+    """
+    Apply func to items on a thread pool, yielding results in input order
+    
+    At most prefetch calls are in flight at once, so a slow consumer stalls
+    the pool instead of letting finished results pile up in memory.
+    
+    Args:
+        func: Function applied to each item
+        items: Iterable of inputs
+        workers: Number of threads (0 runs func inline in the caller)
+        prefetch: Maximum number of submitted but unconsumed calls
+    
+    Yields:
+        func(item) for each item, in order
+    """
+    if workers <= 0:
+        for item in items:
+            yield func(item)
+        return
+    
+    prefetch = max(prefetch, 1)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for item in items:
+            pending.append(executor.submit(func, item))
+            if len(pending) >= prefetch:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def load_image(image_file: Path, cache=None, decode: bool = True):
+    """
+    Read an image file, consulting the detection cache first
+    
+    Args:
+        image_file: Path of the image
+        cache: Optional DetectionCache
+        decode: Decode the image even when cached detections exist
+    
+    Returns:
+        Tuple (path, image or None, cached detections or None, cache key)
+    """
+    if cache is None:
+        with metrics.stage('decode'):
+            return image_file, cv2.imread(str(image_file)), None, None
+    
+    with metrics.stage('read'):
+        data = image_file.read_bytes()
+    with metrics.stage('cache_lookup'):
+        key = cache.key(data)
+        detections = cache.get(key)
+    if detections is not None and not decode:
+        return image_file, None, detections, key
+    
+    with metrics.stage('decode'):
+        image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+    return image_file, image, detections, key
+
+
+def annotate_detections(image, detections: Dict[str, np.ndarray], names):
+    """Draw a detections dict on image in place, with track IDs if it has them"""
+    class_ids = detections['cls'].tolist()
+    labels = [names[class_id] for class_id in class_ids]
+    if 'track' in detections:
+        labels = [f"{label} #{track_id}" for label, track_id in zip(labels, detections['track'].tolist())]
+    return draw_detections(image, detections['xyxy'], labels, detections['conf'].tolist(),
+                           class_ids=class_ids, in_place=True)
+
+
+def write_annotated(output_path: str, image, detections: Dict[str, np.ndarray], names):
+    """Draw detections on image (in place) and encode it to output_path"""
+    with metrics.stage('annotate'):
+        annotate_detections(image, detections, names)
+    with metrics.stage('encode'):
+        ok, encoded = cv2.imencode(Path(output_path).suffix or '.jpg', image)
+    if ok:
+        with metrics.stage('write'):
+            encoded.tofile(output_path)
+
+
+def _process_files(model, image_files, output_dir: Path, conf_threshold: float,
+                   batch_size: int, imgsz: int, workers: int, prefetch: int,
+                   cache=None, save: bool = True, image_dir: Path = None,
+                   on_done=None, on_detections=None, classes: List[int] = None,
+                   roi=None) -> Dict[str, Dict[str, int]]:
+    """
+    Run the decode -> inference -> annotate/write pipeline over image files
+    
+    With workers > 0, decoding and annotate+encode+write run on thread pools
+    around the model stage. Both pools hold at most prefetch batches of
+    images, so memory stays bounded when either side falls behind. Cache
+    hits skip inference, and skip decoding too when nothing is saved.
+    
+    Results are keyed by the path relative to image_dir, and outputs mirror
+    that layout. on_done(image_file, counts) is called once a file's output
+    is completely written, and on_detections(relative_path, detections) with
+    each file's raw detections. classes and roi restrict inference as in
+    run_inference.
+    """
+    max_pending = max(prefetch, 1) * batch_size
+    loaded = bounded_map(lambda image_file: load_image(image_file, cache, save),
+                         image_files, workers, max_pending)
+    writer = ThreadPoolExecutor(max_workers=workers) if workers > 0 else None
+    pending_writes = deque()
+    summary = {}
+    
+    def finish_write():
+        # Runs on this thread, so on_done errors propagate instead of being logged
+        future, image_file, counts = pending_writes.popleft()
+        future.result()
+        if on_done is not None:
+            on_done(image_file, counts)
+    
+    try:
+        for batch in iter_batches(loaded, batch_size):
+            entries = []
+            to_infer = []
+            for image_file, image, detections, key in batch:
+                if image is None and detections is None:
+                    print(f"Skipping unreadable image: {image_file.name}")
+                    continue
+                entry = [image_file, image, detections]
+                entries.append(entry)
+                if detections is None:
+                    to_infer.append((entry, key))
+                    if roi is not None:
+                        check_roi(roi, image.shape[1], image.shape[0], image_file.name)
+            
+            if not entries:
+                continue
+            
+            print(f"Processing batch of {len(entries)} ({len(to_infer)} inferred): "
+                  f"{entries[0][0].name} .. {entries[-1][0].name}")
+            if to_infer:
+                inferred = run_inference(model, [entry[1] for entry, _ in to_infer],
+                                         conf_threshold, imgsz, classes, roi)
+                for (entry, key), detections in zip(to_infer, inferred):
+                    entry[2] = detections
+                    if cache is not None:
+                        cache.put(key, entry[2])
+            
+            for image_file, image, detections in entries:
+                relative = image_file.relative_to(image_dir) if image_dir else Path(image_file.name)
+                counts = count_detections(detections, model.names)
+                summary[relative.as_posix()] = counts
+                if on_detections is not None:
+                    on_detections(relative.as_posix(), detections)
+                if not save:
+                    if on_done is not None:
+                        on_done(image_file, counts)
+                    continue
+                output_path = output_dir / relative.parent / f"detected_{relative.name}"
+                output_path.parent.mkdir(parents=True, exist_ok=True)
+                if writer is None:
+                    write_annotated(str(output_path), image, detections, model.names)
+                    if on_done is not None:
+                        on_done(image_file, counts)
+                    continue
+                future = writer.submit(write_annotated, str(output_path),
+                                       image, detections, model.names)
+                pending_writes.append((future, image_file, counts))
+                while len(pending_writes) > max_pending:
+                    finish_write()
+        
+        while pending_writes:
+            finish_write()
+    finally:
+        if writer is not None:
+            writer.shutdown(wait=True)
+    
+    return summary
+
+
+def merge_counts(count_dicts) -> Dict[str, int]:
+    """Sum several class-count dictionaries into one"""
+    totals = {}
+    for counts in count_dicts:
+        for class_name, count in counts.items():
+            totals[class_name] = totals.get(class_name, 0) + count
+    return totals
+
+
+def model_source(model) -> str:
+    """Return the weights path a model was loaded from"""
+    if isinstance(model, (str, Path)):
+        return str(model)
+    source = getattr(model, 'ckpt_path', None) or getattr(model, 'model_name', None)
+    if not source:
+        raise ValueError("Cannot determine the weights path of this model; "
+                         "pass the model path instead for multi-process runs")
+    return str(source)
+
+
+_worker_model = None
+_worker_cache = None
+
+
+def _init_worker(model_path: str, threads: int, metrics_enabled: bool = False,
+                 cache=None):
+    """Process-pool initializer: pin torch threads, load the model and keep this worker's cache"""
+    global _worker_model, _worker_cache
+    _worker_cache = cache
+    import torch
+    from registry import get_model
+    metrics.enabled = metrics_enabled
+    torch.set_num_threads(threads)
+    torch.set_num_interop_threads(1)
+    _worker_model = get_model(model_path, threads=threads)
+
+
+def _process_shard(shard_args):
+    """Process-pool task: run the image pipeline over one shard of files"""
+    (image_files, output_dir, conf_threshold, batch_size, imgsz, workers, prefetch,
+     save, image_dir, collect, classes, roi) = shard_args
+    metrics.reset()
+    detections = []
+    start = (_worker_cache.hits, _worker_cache.misses) if _worker_cache is not None else (0, 0)
+    summary = _process_files(_worker_model, image_files, output_dir, conf_threshold,
+                             batch_size, imgsz, workers, prefetch, _worker_cache, save,
+                             image_dir,
+                             on_detections=(lambda *item: detections.append(item))
+                             if collect else None,
+                             classes=classes, roi=roi)
+    # The worker's cache outlives the shard, so report only this shard's counts
+    cache_counts = ((_worker_cache.hits - start[0], _worker_cache.misses - start[1])
+                    if _worker_cache is not None else (0, 0))
+    return summary, metrics.snapshot(), detections, cache_counts
+
+
+def _process_files_sharded(model_path: str, image_files, output_dir: Path,
+                           conf_threshold: float, batch_size: int, imgsz: int,
+                           workers: int, prefetch: int, processes: int,
+                           cache=None, save: bool = True, image_dir: Path = None,
+                           on_done=None, on_detections=None, classes: List[int] = None,
+                           roi=None) -> Dict[str, Dict[str, int]]:
+    """
+    Shard image files across a process pool and merge the per-image results
+    
+    Each worker loads the model once and gets an equal share of the CPU
+    cores as torch intra-op threads, so the pool does not oversubscribe,
+    and an equal share of the detection cache's free budget.
+    Shards are a few batches long to keep the workers evenly loaded, and
+    are handed out while image_files is still being enumerated. on_done and
+    on_detections are called in the parent as each shard completes, and
+    each shard's cache hits and misses are added to cache's counters.
+    """
+    threads = max(1, (os.cpu_count() or 1) // processes)
+    shard_size = batch_size * 4
+    shards = ((shard, output_dir, conf_threshold, batch_size, imgsz, workers, prefetch,
+               save, image_dir, on_detections is not None, classes, roi)
+              for shard in iter_batches(image_files, shard_size))
+    
+    print(f"Sharding across {processes} processes ({threads} torch threads each, "
+          f"{shard_size} images per shard)")
+    
+    summary = {}
+    context = multiprocessing.get_context('spawn')
+    with context.Pool(processes, initializer=_init_worker,
+                      initargs=(model_path, threads, metrics.enabled,
+                                cache.share(processes) if cache is not None else None)) as pool:
+        for shard_summary, shard_metrics, shard_detections, (hits, misses) in pool.imap_unordered(
+                _process_shard, shards):
+            summary.update(shard_summary)
+            metrics.merge(shard_metrics)
+            if cache is not None:
+                cache.hits += hits
+                cache.misses += misses
+            for relative, detections in shard_detections:
+                on_detections(relative, detections)
+            if on_done is not None:
+                for relative, counts in shard_summary.items():
+                    on_done(image_dir / relative, counts)
+    
+    return summary
+
+
+def batch_process(model, image_dir: str, output_dir: str, conf_threshold: float = 0.25,
+                  batch_size: int = None, imgsz: int = 640, workers: int = 0,
+                  prefetch: int = 2, processes: int = 0, cache_dir: str = None,
+                  cache_size_mb: int = 1024, save: bool = True, recursive: bool = False,
+                  manifest_path: str = None, detections_out: str = None,
+                  classes=None, roi=None) -> Dict[str, Dict[str, int]]:
     """
     Process multiple images in a directory
     
+    Images are decoded and fed to the model in groups of batch_size so each
+    group runs as a single forward pass. The model letterboxes every image in
+    a batch to a common input shape and scales the boxes back to each
+    source image, so results map one-to-one onto the input files.
+    
     Args:
-        model: YOLO model instance
+        model: YOLO model instance (or weights path)
         image_dir: Directory containing images
         output_dir: Directory to save results
         conf_threshold: Confidence threshold
+        batch_size: Number of images per forward pass (None = from the
+            autotune profile, else 16)
+        imgsz: Inference image size
+        workers: Threads for decoding and for writing results (0 = sequential)
+        prefetch: Batches decoded ahead of / queued behind the model
+        processes: Worker processes, each with its own model copy (0 = in-process)
+        cache_dir: Directory of the detection cache (None = no caching)
+        cache_size_mb: Cache size budget before old entries are evicted
+        save: Write annotated images to output_dir
+        recursive: Also process images in subdirectories
+        manifest_path: SQLite manifest recording finished files; files already
+            recorded with the same mtime and size are skipped, so an
+            interrupted run can be resumed
+        detections_out: Directory of a columnar detection store receiving
+            every box, labelled with its image path; when resuming from a
+            manifest, the new boxes are appended to it
+        classes: Class names or ids to detect; other classes are dropped in
+            the model's NMS instead of after it (None = all)
+        roi: (x1, y1, x2, y2) pixel region; only this part of each image is
+            inferred (None = whole image); ValueError if it is malformed or empty
+    
+    Returns:
+        Dictionary mapping image paths (relative to image_dir) to their object counts
     """
-    image_extensions = {'.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.webp'}
     image_dir = Path(image_dir)
     output_dir = Path(output_dir)
     output_dir.mkdir(parents=True, exist_ok=True)
     
-    image_files = [f for f in image_dir.iterdir() 
-                   if f.suffix.lower() in image_extensions]
+    if batch_size is None:
+        tuned = tuned_settings('inference', imgsz)
+        batch_size = tuned['batch'] if tuned else 16
     
-    print(f"Found {len(image_files)} images to process")
+    # Files are streamed to the pipeline while the directory is still being scanned
+    image_files = scan_images(image_dir, recursive)
+    
+    summary = {}
+    manifest = None
+    on_done = None
+    skipped = [0]
+    if manifest_path:
+        manifest = Manifest(manifest_path)
+        on_done = manifest.record
+        print(f"Using manifest {manifest_path} ({len(manifest)} files recorded)")
+        
+        def pending_files(files):
+            for image_file in files:
+                counts = manifest.lookup(image_file)
+                if counts is None:
+                    yield image_file
+                else:
+                    summary[image_file.relative_to(image_dir).as_posix()] = counts
+                    skipped[0] += 1
+        
+        image_files = pending_files(image_files)
     
-    for image_file in image_files:
-        print(f"Processing: {image_file.name}")
-        results = model(str(image_file), conf=conf_threshold)
-        output_path = output_dir / f"detected_{image_file.name}"
-        results[0].save(str(output_path))
+    names = None
+    if classes or detections_out:
+        names = model.names if hasattr(model, 'names') else get_model_info(str(model))['classes']
+    classes = resolve_classes(classes, names)
+    if classes is not None:
+        print(f"Detecting only: {', '.join(names[class_id] for class_id in classes)}")
+    if roi is not None:
+        roi = parse_box(roi)
+        print(f"Inferring only inside ROI {roi}")
+    
+    cache = None
+    if cache_dir:
+        cache = DetectionCache(cache_dir, model_source(model), conf_threshold, imgsz,
+                               max_bytes=cache_size_mb * 1024 * 1024,
+                               variant=filter_variant(classes, roi))
+    
+    store = None
+    on_detections = None
+    if detections_out:
+        # A resumed run adds to the store instead of replacing the files it skips
+        resuming = manifest is not None and len(manifest) > 0
+        store = DetectionWriter(detections_out, names, source=str(image_dir), append=resuming)
+        on_detections = lambda relative, detections: store.append(detections, label=relative)
+    
+    try:
+        if processes > 1:
+            summary.update(_process_files_sharded(model_source(model), image_files, output_dir,
+                                                  conf_threshold, batch_size, imgsz,
+                                                  workers, prefetch, processes, cache, save,
+                                                  image_dir, on_done, on_detections,
+                                                  classes, roi))
+        else:
+            if isinstance(model, (str, Path)):
+                from registry import get_model
+                model = get_model(str(model), imgsz=imgsz)
+            summary.update(_process_files(model, image_files, output_dir, conf_threshold,
+                                          batch_size, imgsz, workers, prefetch, cache, save,
+                                          image_dir, on_done, on_detections, classes, roi))
+    finally:
+        if manifest is not None:
+            manifest.close()
+        if store is not None:
+            store.close()
+            print(f"Detections stored in: {detections_out} ({store.rows} boxes)")
+    
+    if cache is not None:
+        print(cache.stats())
+    print(f"Processed {len(summary) - skipped[0]} images"
+          + (f", skipped {skipped[0]} already in the manifest" if manifest_path else ""))
+    
+    totals = merge_counts(summary.values())
+    if totals:
+        print("\nTotal detections:")
+        for class_name, count in sorted(totals.items(), key=lambda item: -item[1]):
+            print(f"  {class_name}: {count}")
     
     print(f"\nAll images processed. Results saved to: {output_dir}")
-
+    return summary